@@ -0,0 +1,68 @@
+"""
+Geradores de dados sintéticos para os benchmarks (não dependem de src/).
+"""
+import numpy as np
+import pandas as pd
+
+
+def synth_qy_panel(n_tickers: int = 300, n_quarters: int = 80, start_year: int = 2005,
+                   missing: float = 0.05, seed: int = 0) -> pd.DataFrame:
+    """Painel no formato de build_qy_panel (Ticker, FY, FQ, *_QY) com buracos aleatórios."""
+    rng = np.random.default_rng(seed)
+    tickers = [f"TK{i:04d}3" for i in range(n_tickers)]
+    qk = np.arange(n_quarters) + start_year * 4 + 1
+    fy, fq = (qk - 1) // 4, (qk - 1) % 4 + 1
+
+    rets = rng.normal(0.02, 0.12, size=(n_tickers, n_quarters))
+    preco = 20.0 * np.exp(np.cumsum(rets, axis=1))
+    preco[rng.random(preco.shape) < missing] = np.nan
+    acoes = np.repeat(rng.integers(10**8, 10**9, size=(n_tickers, 1)), n_quarters, axis=1).astype(float)
+    divid = np.where(rng.random(preco.shape) < 0.5, preco * acoes * rng.uniform(0.0, 0.03, size=preco.shape), np.nan)
+
+    out = pd.DataFrame({
+        "Ticker": np.repeat(tickers, n_quarters),
+        "FY": np.tile(fy, n_tickers),
+        "FQ": np.tile(fq, n_tickers),
+        "Preco_QY": preco.ravel(),
+        "Acoes_Emitidas_QY": acoes.ravel(),
+        "Dividendos_QY": divid.ravel(),
+        "JCP_QY": np.nan,
+    })
+    out["DPS_QY"] = (out["Dividendos_QY"].fillna(0.0) + out["JCP_QY"].fillna(0.0)) / out["Acoes_Emitidas_QY"]
+    out["DY_QY"] = out["DPS_QY"] / out["Preco_QY"]
+    return out
+
+
+def synth_portfolio(df_qy: pd.DataFrame, n: int = 40, seed: int = 1) -> dict:
+    rng = np.random.default_rng(seed)
+    tickers = rng.choice(df_qy["Ticker"].unique(), size=n, replace=False)
+    return {str(t): {"quantidade": int(rng.integers(1, 500)), "preco_unitario": 10.0} for t in tickers}
+
+
+def synth_raw_base(n_tickers: int = 1000, n_years: int = 25, start_year: int = 2000,
+                   missing: float = 0.05, seed: int = 0) -> pd.DataFrame:
+    """
+    Base bruta mensal (formato do frame do catálogo: Ticker category, Data_Referencia datetime)
+    com as colunas de preço/ações/proventos lidas por build_qy_panel.
+    """
+    rng = np.random.default_rng(seed)
+    tickers = [f"TK{i:04d}3" for i in range(n_tickers)]
+    datas = pd.date_range(f"{start_year}-01-31", periods=n_years * 12, freq="ME")
+    n = n_tickers * len(datas)
+
+    rets = rng.normal(0.007, 0.07, size=(n_tickers, len(datas)))
+    preco = (20.0 * np.exp(np.cumsum(rets, axis=1))).ravel()
+    preco[rng.random(n) < missing] = np.nan
+    acoes = np.repeat(rng.integers(10**8, 10**9, size=n_tickers), len(datas)).astype(float)
+    acoes[rng.random(n) < missing] = np.nan
+    divid = np.where(rng.random(n) < 0.3, rng.uniform(1e6, 5e7, n), np.nan)
+    jcp = np.where(rng.random(n) < 0.2, rng.uniform(1e6, 5e7, n), np.nan)
+
+    return pd.DataFrame({
+        "Ticker": pd.Categorical(np.repeat(tickers, len(datas))),
+        "Data_Referencia": np.tile(datas.values, n_tickers),
+        "Preco_Atual": preco,
+        "Acoes_Emitidas": acoes,
+        "Dividendos": divid,
+        "Juros_Sobre_Capital_Proprio": jcp,
+    })
@@ -0,0 +1,49 @@
+"""
+Benchmark: simulate_batch_quarterly (N carteiras numa chamada) vs. N chamadas
+de simulate_historical_quarterly.
+
+Uso (na raiz do projeto):
+    python -m bench.bench_batch [n_carteiras]
+"""
+import sys
+import time
+
+import numpy as np
+
+import controller.utils as utils
+from bench._synth import synth_qy_panel
+
+
+def main():
+    n_port = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    n_amostra = 50
+
+    df_qy = synth_qy_panel(n_tickers=400, n_quarters=81)
+    base_fy, base_fq = int(df_qy["FY"].iloc[0]), int(df_qy["FQ"].iloc[0])
+
+    rng = np.random.default_rng(2)
+    tickers = rng.choice(df_qy["Ticker"].unique(), size=40, replace=False).tolist()
+    qty = rng.integers(0, 500, size=(n_port, len(tickers)))
+
+    utils.build_qy_matrices(df_qy)  # painel preparado uma vez
+
+    t0 = time.perf_counter()
+    res = utils.simulate_batch_quarterly(qty, tickers, df_qy, base_fy, base_fq)
+    t_batch = time.perf_counter() - t0
+
+    # referência: chamadas individuais numa amostra, extrapoladas para N
+    t0 = time.perf_counter()
+    for i in range(n_amostra):
+        pf = {t: {"quantidade": int(q)} for t, q in zip(tickers, qty[i])}
+        tl, kpis, _, _ = utils.simulate_historical_quarterly(pf, df_qy, base_fy, base_fq)
+        assert np.isclose(kpis["ret_total"], res["ret_total"][i], equal_nan=True)
+        assert np.allclose(tl["Valor_Sem_Dividendos"].to_numpy(), res["valor"][i])
+    t_single = (time.perf_counter() - t0) / n_amostra * n_port
+
+    print(f"{n_port} carteiras × {len(tickers)} tickers × {len(res['anos'])} trimestres")
+    print(f"lote (1 chamada)            : {t_batch:8.3f} s")
+    print(f"chamadas individuais (est.) : {t_single:8.3f} s  ({t_single / t_batch:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: varredura de planos de aporte (valor × frequência) no motor de fluxos de
+caixa — um plano por chamada vs. todos os planos numa chamada só — e vazão da TIR vetorizada.
+
+Uso (na raiz do projeto):
+    python -m bench.bench_cashflow [n_planos] [n_tickers]
+"""
+import sys
+import time
+
+import numpy as np
+
+import controller.cashflow as cashflow
+import controller.utils as utils
+from bench._synth import synth_qy_panel, synth_portfolio
+
+
+FREQS = (1, 2, 4)
+
+
+def _timeit(fn, repeat: int = 3) -> float:
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    n_planos = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    n_tk = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    df_qy = synth_qy_panel(n_tickers=300, n_quarters=80)
+    mats = utils.build_qy_matrices(df_qy)
+    pesos = {t: float(v["quantidade"]) for t, v in synth_portfolio(df_qy, n=n_tk).items()}
+    ano, tri = 2007, 1
+    n_t = len(mats["qkeys"]) - int(np.searchsorted(mats["qkeys"], ano * 4 + tri))
+
+    valores = np.linspace(0.0, 5000.0, -(-n_planos // len(FREQS)))
+    aportes = np.vstack([cashflow.contribution_schedule(n_t, 10_000.0, v, k) for k in FREQS for v in valores])[:n_planos]
+
+    def _um_por_vez():
+        return [cashflow.simulate_cashflows(mats, pesos, ano, tri, a)["irr_anual"][0] for a in aportes]
+
+    def _todos():
+        return cashflow.simulate_cashflows(mats, pesos, ano, tri, aportes)["irr_anual"]
+
+    n_ref = min(300, len(aportes))
+    ref = np.array([cashflow.simulate_cashflows(mats, pesos, ano, tri, a)["irr_anual"][0] for a in aportes[:n_ref]])
+    assert np.allclose(ref, _todos()[:n_ref], rtol=1e-9, equal_nan=True)
+
+    t_loop = _timeit(lambda: [cashflow.simulate_cashflows(mats, pesos, ano, tri, a) for a in aportes[:n_ref]], 1)
+    t_loop *= len(aportes) / n_ref
+    t_vec = _timeit(_todos)
+
+    sim = cashflow.simulate_cashflows(mats, pesos, ano, tri, aportes)
+    fluxos = -sim["aportes"].copy()
+    fluxos[:, -1] += sim["valor_final"]
+    t_irr = _timeit(lambda: cashflow.irr(fluxos))
+
+    print(f"{len(aportes):,} planos x {n_t} trimestres, {len(sim['tickers'])} tickers (mesmas TIRs)")
+    print(f"um plano por chamada (estimado) : {t_loop * 1e3:8.1f} ms")
+    print(f"todos os planos numa chamada    : {t_vec * 1e3:8.1f} ms  ({t_loop / t_vec:,.0f}x)")
+    print(f"só a TIR vetorizada             : {t_irr * 1e3:8.1f} ms  ({len(aportes) / t_irr:,.0f} TIRs/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: cenários por bootstrap em blocos — laço por cenário vs. sorteio vetorizado
+(cenários × trimestres), leque de percentis e pool de processos para corridas maiores.
+
+Uso (na raiz do projeto):
+    python -m bench.bench_montecarlo [n_cenarios] [horizonte] [workers]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+import controller.montecarlo as montecarlo
+import controller.utils as utils
+from bench._synth import synth_qy_panel, synth_portfolio
+
+
+def _por_cenario(qr: dict, n_paths: int, horizon: int, block: int, seed: int) -> np.ndarray:
+    """Referência ingênua: um cenário por vez, bloco a bloco (buy-and-hold)."""
+    rng = np.random.default_rng(seed)
+    r, w = qr["retornos"], qr["pesos"]
+    out = np.ones((n_paths, horizon + 1))
+    for s in range(n_paths):
+        valor = w.copy()
+        h = 0
+        while h < horizon:
+            ini = rng.integers(0, len(r))
+            for j in range(min(block, horizon - h)):
+                valor = valor * (1.0 + r[(ini + j) % len(r)])
+                h += 1
+                out[s, h] = valor.sum()
+    return out
+
+
+def main():
+    n_paths = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    horizon = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else min(4, os.cpu_count() or 1)
+
+    df_qy = synth_qy_panel(n_tickers=300, n_quarters=80)
+    mats = utils.build_qy_matrices(df_qy)
+    pesos = {t: float(v["quantidade"]) for t, v in synth_portfolio(df_qy, n=20).items()}
+    qr = montecarlo.quarter_returns(mats, pesos)
+
+    n_ref = 2_000
+    t0 = time.perf_counter()
+    _por_cenario(qr, n_ref, horizon, 4, 0)
+    t_loop = (time.perf_counter() - t0) * n_paths / n_ref
+
+    t0 = time.perf_counter()
+    cresc = montecarlo.bootstrap_paths(qr, n_paths, horizon, 4, seed=0)
+    t_bh = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    montecarlo.bootstrap_paths(qr, n_paths, horizon, 4, seed=0, rebalance=True)
+    t_reb = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    montecarlo.fan(cresc)
+    t_fan = time.perf_counter() - t0
+
+    n_grande = 5 * n_paths
+    t0 = time.perf_counter()
+    serie = montecarlo.bootstrap_paths(qr, n_grande, horizon, 4, seed=0)
+    t_serie = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    pool = montecarlo.bootstrap_paths(qr, n_grande, horizon, 4, seed=0, workers=workers)
+    t_pool = time.perf_counter() - t0
+    assert np.array_equal(serie, pool)
+
+    print(f"{n_paths:,} cenários x {horizon} trimestres, {len(qr['tickers'])} tickers, {len(qr['retornos'])} trimestres de histórico")
+    print(f"laço por cenário (estimado)     : {t_loop * 1e3:8.1f} ms")
+    print(f"vetorizado, buy-and-hold        : {t_bh * 1e3:8.1f} ms  ({t_loop / t_bh:,.0f}x)")
+    print(f"vetorizado, rebalanceado        : {t_reb * 1e3:8.1f} ms")
+    print(f"leque (percentis das 3 métricas): {t_fan * 1e3:8.1f} ms")
+    print(f"{f'{n_grande:,} cenários em série':32s}: {t_serie * 1e3:8.1f} ms")
+    print(f"{f'{n_grande:,} cenários, {workers} processo(s)':32s}: {t_pool * 1e3:8.1f} ms  (mesmo resultado)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: filtros por faixa da Lista — reatribuições sequenciais df = df[...]
+(uma cópia por slider) vs. máscara única do screener (searchsorted em índices ordenados).
+
+Uso (na raiz do projeto):
+    python -m bench.bench_screener [n_tickers] [n_colunas]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import controller.screener as screener
+
+
+def _timeit(fn, repeat: int = 5) -> float:
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _sequencial(df: pd.DataFrame, ranges: dict) -> pd.DataFrame:
+    """Regra original da página (uma reatribuição por limite)."""
+    for col, (lo, hi) in ranges.items():
+        if lo == 0:
+            df = df[(df[col] >= lo) | (df[col].isna()) | (df[col] < lo)]
+        else:
+            df = df[(df[col] >= lo) | (df[col].isna())]
+        if hi != screener.SLIDER_MAX:
+            df = df[(df[col] <= hi)]
+    return df
+
+
+def main():
+    n_tk = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_cols = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+
+    rng = np.random.default_rng(0)
+    data = rng.lognormal(1.0, 1.0, size=(n_tk, n_cols))
+    data[rng.random(data.shape) < 0.01] = np.nan
+    df = pd.DataFrame(data, columns=[f"Ind_{i:02d}" for i in range(n_cols)])
+    df.insert(0, "Ticker", [f"TK{i:05d}" for i in range(n_tk)])
+
+    t0 = time.perf_counter()
+    index = screener.build_range_index(df)
+    t_build = time.perf_counter() - t0
+
+    # ~1 em 5 sliders mexidos, o resto no padrão (limites do próprio slider)
+    ranges = {}
+    for col, ix in index["cols"].items():
+        lo, hi, _ = ix["bounds"]
+        if rng.random() < 0.2:
+            lo = lo + (hi - lo) * 0.01
+        ranges[col] = (lo, hi)
+
+    ref = _sequencial(df, ranges)
+    mask = screener.range_mask(index, ranges)
+    assert list(df.index[mask]) == list(ref.index)
+
+    t_seq = _timeit(lambda: _sequencial(df, ranges))
+    t_mask = _timeit(lambda: df[screener.range_mask(index, ranges)])
+    print(f"{n_tk} tickers x {n_cols} colunas -> {len(ref)} linhas após os filtros (mesmo resultado)")
+    print(f"índice (1x por período): {t_build * 1e3:8.1f} ms")
+    print(f"sequencial df = df[...]: {t_seq * 1e3:8.1f} ms")
+    print(f"máscara única          : {t_mask * 1e3:8.1f} ms  ({t_seq / t_mask:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: médias setoriais da página Análise — filtro setor/FY + pd.to_numeric por
+indicador a cada rerun (como nos cards) vs. lookup no cubo de sector_stats.
+
+Uso (na raiz do projeto):
+    python -m bench.bench_sector_stats [n_tickers] [n_indicadores]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import controller.sector_stats as sector_stats
+from bench._synth import synth_raw_base
+
+
+N_SETORES = 12
+N_GRUPOS = 5  # grupos de cards da página (cada um refazia o filtro)
+
+
+def _timeit(fn, repeat: int = 5) -> float:
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _medias_por_filtro(df: pd.DataFrame, setor, fy: int, cols: list) -> dict:
+    """Regra original da página: um filtro por grupo de cards, to_numeric por indicador."""
+    out = {}
+    for _ in range(N_GRUPOS):
+        df_sec = df[(df["Setor_Oficial_final"] == setor) & (df["FY"] == fy)].copy()
+        for col in cols:
+            s = pd.to_numeric(df_sec[col], errors="coerce")
+            out[col] = float(s.mean()) if s.notna().any() else np.nan
+    return out
+
+
+def _medias_por_cubo(cube: pd.DataFrame, setor, fy: int, cols: list) -> dict:
+    out = {}
+    for _ in range(N_GRUPOS):
+        stats = sector_stats.lookup(cube, setor, fy)
+        for col in cols:
+            out[col] = sector_stats.stat(stats, col)
+    return out
+
+
+def main():
+    n_tk = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n_ind = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    rng = np.random.default_rng(0)
+    df = synth_raw_base(n_tickers=n_tk)
+    setores = rng.integers(0, N_SETORES, size=n_tk)
+    df["Setor_Oficial_final"] = pd.Categorical(
+        [f"Setor {s:02d}" for s in setores[df["Ticker"].cat.codes.to_numpy()]])
+    df["FY"] = df["Data_Referencia"].dt.year.astype("Int16")
+    df["FQ"] = df["Data_Referencia"].dt.quarter.astype("Int8")
+    cols = [f"Ind_{i:02d}" for i in range(n_ind)]
+    vals = rng.lognormal(0.0, 1.0, size=(len(df), n_ind))
+    vals[rng.random(vals.shape) < 0.05] = np.nan
+    df = pd.concat([df, pd.DataFrame(vals, columns=cols)], axis=1)
+
+    t0 = time.perf_counter()
+    cube = sector_stats.build_cube(df, "Setor_Oficial_final")
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    sector_stats.build_cube(df, "Setor_Oficial_final", quarterly=True)
+    t_build_q = time.perf_counter() - t0
+
+    setor, fy = "Setor 03", int(df["FY"].max()) - 1
+    ref = _medias_por_filtro(df, setor, fy, cols)
+    got = _medias_por_cubo(cube, setor, fy, cols)
+    assert all(np.isclose(ref[c], got[c], rtol=1e-12, equal_nan=True) for c in cols)
+
+    t_old = _timeit(lambda: _medias_por_filtro(df, setor, fy, cols))
+    t_new = _timeit(lambda: _medias_por_cubo(cube, setor, fy, cols))
+    print(f"{len(df):,} linhas x {n_ind} indicadores, {N_SETORES} setores (mesmas médias)")
+    print(f"cubo anual (1x por versão)      : {t_build * 1e3:8.1f} ms")
+    print(f"cubo trimestral (1x por versão) : {t_build_q * 1e3:8.1f} ms")
+    print(f"filtro + to_numeric por rerun   : {t_old * 1e3:8.1f} ms")
+    print(f"lookup no cubo por rerun        : {t_new * 1e3:8.1f} ms  ({t_old / t_new:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark: motor matricial (simulate_historical_quarterly) vs. laço original
+(_simulate_loop, a implementação anterior, mantida aqui como referência).
+
+Uso (na raiz do projeto):
+    python -m bench.bench_simulacao [n_tickers_carteira] [n_trimestres]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import controller.utils as utils
+from bench._synth import synth_qy_panel, synth_portfolio
+
+
+def _timeit(fn, repeat: int = 5) -> float:
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _simulate_loop(portfolio: dict, df_qy: pd.DataFrame, base_year: int, base_quarter: int):
+    """Implementação original (laço trimestre × ticker com lookup no índice), referência do motor matricial."""
+    if not portfolio:
+        kpis = {"valor_inicial": 0.0, "valor_final": 0.0, "div_acum": 0.0, "ret_total": np.nan, "cagr": np.nan}
+        return pd.DataFrame(), kpis, [], pd.DataFrame()
+
+    df_qy = df_qy.copy()
+    df_qy["Ticker"] = df_qy["Ticker"].astype(str).str.strip().str.upper()
+    portfolio = {str(k).strip().upper(): v for k, v in portfolio.items()}
+    base_year, base_quarter = int(base_year), int(base_quarter)
+
+    base = df_qy[(df_qy["FY"] == base_year) & (df_qy["FQ"] == base_quarter)][["Ticker", "Preco_QY"]].dropna()
+    base_prices = dict(zip(base["Ticker"], base["Preco_QY"]))
+
+    excluidos, valid = [], {}
+    for tck, d in portfolio.items():
+        if tck in base_prices and np.isfinite(base_prices[tck]):
+            valid[tck] = {"qtd": int(d.get("quantidade", 0)), "preco_base": float(base_prices[tck])}
+        else:
+            excluidos.append(tck)
+    if not valid:
+        kpis = {"valor_inicial": 0.0, "valor_final": 0.0, "div_acum": 0.0, "ret_total": np.nan, "cagr": np.nan}
+        return pd.DataFrame(), kpis, excluidos, pd.DataFrame()
+
+    valor_inicial = sum(v["qtd"] * v["preco_base"] for v in valid.values())
+
+    base_key = base_year * 4 + base_quarter
+    df_qy["qkey"] = df_qy["FY"] * 4 + df_qy["FQ"]
+    qkeys = sorted(df_qy.loc[df_qy["qkey"] > base_key, "qkey"].dropna().unique().tolist())
+    fy_idx = df_qy.set_index(["Ticker", "FY", "FQ"])
+
+    timeline, details_rows = [], []
+    div_acum = 0.0
+    valor_final = valor_inicial
+
+    for qk in qkeys:
+        ano = qk // 4
+        tri = qk % 4
+        if tri == 0:
+            ano -= 1
+            tri = 4
+
+        valor_trim = 0.0
+        div_trim = 0.0
+
+        for tck, v in valid.items():
+            preco = np.nan
+            dps = 0.0
+            if (tck, ano, tri) in fy_idx.index:
+                row = fy_idx.loc[(tck, ano, tri)]
+                preco = float(row.get("Preco_QY")) if np.isfinite(row.get("Preco_QY")) else np.nan
+                dps   = float(row.get("DPS_QY"))   if np.isfinite(row.get("DPS_QY"))   else 0.0
+
+            qtd = v["qtd"]
+            valor_ticker = (qtd * preco) if np.isfinite(preco) else np.nan
+            div_ticker   = qtd * dps
+            if np.isfinite(valor_ticker):
+                valor_trim += valor_ticker
+            div_trim += div_ticker
+
+            details_rows.append({
+                "Ano": int(ano), "Trimestre": int(tri), "Ticker": tck,
+                "Valor_Ticker": valor_ticker, "Dividendos_Ticker": div_ticker
+            })
+
+        div_acum += div_trim
+        valor_final = valor_trim if np.isfinite(valor_trim) else valor_final
+        timeline.append({"Ano": int(ano), "Trimestre": int(tri), "Valor_Sem_Dividendos": valor_trim, "Dividendos_Trimestre": div_trim})
+
+    n_quarters = len(qkeys)
+    ret_total = ((valor_final + div_acum - valor_inicial) / valor_inicial) if valor_inicial > 0 else np.nan
+    cagr = (((valor_final + div_acum) / valor_inicial) ** (4 / n_quarters) - 1) if (valor_inicial > 0 and n_quarters > 0) else np.nan
+    kpis = {"valor_inicial": float(valor_inicial), "valor_final": float(valor_final), "div_acum": float(div_acum),
+            "ret_total": float(ret_total) if np.isfinite(ret_total) else np.nan,
+            "cagr": float(cagr) if np.isfinite(cagr) else np.nan}
+
+    details = pd.DataFrame(details_rows)
+    return pd.DataFrame(timeline), kpis, excluidos, details
+
+
+def main():
+    n_port = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    n_q = int(sys.argv[2]) if len(sys.argv) > 2 else 80
+
+    df_qy = synth_qy_panel(n_tickers=400, n_quarters=n_q + 1)
+    portfolio = synth_portfolio(df_qy, n=n_port)
+    base_fy, base_fq = int(df_qy["FY"].iloc[0]), int(df_qy["FQ"].iloc[0])
+
+    ref = _simulate_loop(portfolio, df_qy, base_fy, base_fq)
+    new = utils.simulate_historical_quarterly(portfolio, df_qy, base_fy, base_fq)
+
+    # mesma saída (timeline, kpis, excluídos, detalhe)
+    pd.testing.assert_frame_equal(ref[0], new[0], check_dtype=False)
+    pd.testing.assert_frame_equal(ref[3], new[3], check_dtype=False)
+    assert ref[2] == new[2]
+    for k, v in ref[1].items():
+        assert np.isclose(v, new[1][k], equal_nan=True), k
+
+    t_loop = _timeit(lambda: _simulate_loop(portfolio, df_qy, base_fy, base_fq), repeat=3)
+    t_cold = _timeit(lambda: (utils.clear_matrices_cache(),
+                              utils.simulate_historical_quarterly(portfolio, df_qy, base_fy, base_fq)))
+    t_warm = _timeit(lambda: utils.simulate_historical_quarterly(portfolio, df_qy, base_fy, base_fq))
+
+    print(f"carteira={n_port} tickers, {n_q} trimestres, painel={len(df_qy)} linhas")
+    print(f"laço original      : {t_loop * 1e3:9.2f} ms")
+    print(f"matricial (frio)   : {t_cold * 1e3:9.2f} ms  ({t_loop / t_cold:6.1f}x)")
+    print(f"matricial (quente) : {t_warm * 1e3:9.2f} ms  ({t_loop / t_warm:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
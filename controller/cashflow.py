@@ -0,0 +1,198 @@
+"""
+Motor de fluxos de caixa: aportes periódicos, reinvestimento de dividendos (DRIP) e
+rebalanceamento opcional para pesos-alvo sobre as matrizes do painel trimestral.
+
+Vários planos de aporte rodam juntos (uma linha por plano), então varrer valores e
+frequências de aporte é um laço sobre trimestres com operações (planos × tickers).
+Reporta retorno ponderado pelo tempo (TWR, cota) e TIR ponderada pelo capital,
+calculada por um solver vetorizado (Newton com salvaguarda de bisseção).
+
+Convenções:
+  - compras em frações de ação, pelo preço médio do trimestre;
+  - preço ausente repete o último conhecido (valoração e negociação);
+  - preço <= 0 (dado inválido) vale o último conhecido na valoração, mas o ticker não é
+    negociado no trimestre: a compra (aporte, DRIP, rebalanceamento) fica em caixa;
+  - sem DRIP, dividendos ficam em caixa (sem rendimento) e entram no valor da carteira;
+  - tickers sem preço válido no trimestre-base ficam de fora e os pesos são renormalizados.
+"""
+import numpy as np
+import pandas as pd
+
+
+IRR_LO, IRR_HI = -0.95, 10.0     # faixa de busca da TIR trimestral
+
+
+def contribution_schedule(n_quarters: int, initial: float, amount: float = 0.0, every: int = 1) -> np.ndarray:
+    """Aportes por trimestre (índice 0 = trimestre-base): `initial` no base e `amount` a cada `every` trimestres."""
+    fluxos = np.zeros(n_quarters)
+    if n_quarters == 0:
+        return fluxos
+    if amount and every > 0:
+        fluxos[every::every] = amount
+    fluxos[0] += initial
+    return fluxos
+
+
+def _ffill(m: np.ndarray) -> np.ndarray:
+    """Repete o último valor finito ao longo das colunas."""
+    ok = np.isfinite(m)
+    idx = np.where(ok, np.arange(m.shape[1])[None, :], 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return m[np.arange(m.shape[0])[:, None], idx]
+
+
+def simulate_cashflows(mats: dict, weights: dict, base_year: int, base_quarter: int, aportes,
+                       drip: bool = True, rebalance_every: int = 0) -> dict:
+    """
+    mats: matrizes do painel (utils.load_qy_matrices / utils.build_qy_matrices).
+    weights: {ticker: peso-alvo} (normalizados aqui).
+    aportes: vetor (n_trimestres,) ou matriz (n_planos × n_trimestres) de aportes; coluna 0 = base.
+             Colunas a mais são ignoradas; a menos, completadas com zero.
+    rebalance_every: 0 = nunca; k = volta aos pesos-alvo a cada k trimestres (caixa incluso).
+
+    Retorna dict com "tickers", "excluidos", "anos", "trimestres" e, por plano (linhas):
+    "aportes", "dividendos", "valor" (fim de trimestre), "retorno" (do trimestre, p/ TWR),
+    "total_aportado", "valor_final", "twr", "twr_anual", "irr_anual".
+    """
+    qk = int(base_year) * 4 + int(base_quarter)
+    bpos = int(np.searchsorted(mats["qkeys"], qk))
+    if bpos >= len(mats["qkeys"]) or mats["qkeys"][bpos] != qk:
+        raise ValueError(f"Trimestre-base {base_year}T{base_quarter} não existe no painel.")
+
+    tickers, rows, pesos, excluidos = [], [], [], []
+    for tck, w in weights.items():
+        t = str(tck).strip().upper()
+        i = mats["tk_pos"].get(t)
+        if not w > 0:
+            continue
+        if i is None or not mats["preco"][i, bpos] > 0:
+            excluidos.append(t)
+            continue
+        tickers.append(t)
+        rows.append(i)
+        pesos.append(float(w))
+    if not rows:
+        raise ValueError("Nenhum ticker com preço no trimestre-base.")
+    w = np.asarray(pesos) / np.sum(pesos)
+
+    bruto = np.asarray(mats["preco"][rows, bpos:], dtype="float64")             # K × T
+    negociavel = ~(bruto <= 0)                                                 # NaN negocia no preço repetido
+    preco = _ffill(np.where(bruto > 0, bruto, np.nan))
+    dps = np.asarray(mats["dps"][rows, bpos:], dtype="float64")
+    dps = np.where(np.isfinite(dps), dps, 0.0)
+    n_t = preco.shape[1]
+
+    fluxos = np.atleast_2d(np.asarray(aportes, dtype="float64"))
+    if fluxos.shape[1] < n_t:
+        fluxos = np.pad(fluxos, ((0, 0), (0, n_t - fluxos.shape[1])))
+    fluxos = fluxos[:, :n_t]
+    n_s = fluxos.shape[0]
+
+    acoes = np.zeros((n_s, len(rows)))
+    caixa = np.zeros(n_s)
+    valor = np.zeros((n_s, n_t))
+    divid = np.zeros((n_s, n_t))
+    ret = np.zeros((n_s, n_t))
+    for t in range(n_t):
+        p = preco[:, t]
+        neg = negociavel[:, t]
+        if t > 0:
+            div_tck = acoes * dps[:, t]
+            divid[:, t] = div_tck.sum(axis=1)
+            if drip:
+                acoes += np.where(neg, div_tck, 0.0) / p
+                caixa += np.where(neg, 0.0, div_tck).sum(axis=1)
+            else:
+                caixa += divid[:, t]
+            antes = acoes @ p + caixa
+            anterior = valor[:, t - 1]
+            ret[:, t] = np.where(anterior > 0, antes / np.where(anterior > 0, anterior, 1.0) - 1.0, 0.0)
+        compra = fluxos[:, t][:, None] * w
+        acoes += np.where(neg, compra, 0.0) / p
+        caixa += np.where(neg, 0.0, compra).sum(axis=1)
+        if rebalance_every and t > 0 and t % rebalance_every == 0:
+            # quem não negocia no trimestre mantém a posição; a parte dele no alvo fica em caixa
+            total = acoes @ p + caixa
+            disponivel = total - np.where(neg, 0.0, acoes) @ p
+            alvo = total[:, None] * np.where(neg, w, 0.0)
+            escala = np.minimum(1.0, disponivel / np.maximum(alvo.sum(axis=1), 1e-300))
+            alvo *= escala[:, None]
+            acoes = np.where(neg, alvo / p, acoes)
+            caixa = disponivel - alvo.sum(axis=1)
+        valor[:, t] = acoes @ p + caixa
+
+    twr = np.prod(1.0 + ret, axis=1) - 1.0
+    twr_anual = (1.0 + twr) ** (4 / (n_t - 1)) - 1.0 if n_t > 1 else np.full(n_s, np.nan)
+    fluxo_investidor = -fluxos.copy()
+    fluxo_investidor[:, -1] += valor[:, -1]
+    irr_q = irr(fluxo_investidor)
+
+    return {
+        "tickers": tickers, "excluidos": excluidos,
+        "anos": mats["anos"][bpos:], "trimestres": mats["tris"][bpos:],
+        "aportes": fluxos, "dividendos": divid, "valor": valor, "retorno": ret,
+        "total_aportado": fluxos.sum(axis=1), "valor_final": valor[:, -1],
+        "twr": twr, "twr_anual": twr_anual, "irr_anual": (1.0 + irr_q) ** 4 - 1.0,
+    }
+
+
+def irr(fluxos, tol: float = 1e-10, max_iter: int = 100) -> np.ndarray:
+    """
+    TIR por período de cada linha de `fluxos` (n_planos × n_períodos; negativo = saída do
+    investidor). Newton vetorizado com intervalo [IRR_LO, IRR_HI] mantido por linha: passos
+    que saem do intervalo ou que não convergem rápido viram bisseção. Sem troca de sinal
+    no intervalo -> NaN.
+    """
+    cf = np.atleast_2d(np.asarray(fluxos, dtype="float64"))
+    n_s, n_t = cf.shape
+    t = np.arange(n_t, dtype="float64")
+
+    def _npv(c, r):
+        return (c * (1.0 + r)[:, None] ** -t).sum(axis=1)
+
+    lo = np.full(n_s, IRR_LO)
+    hi = np.full(n_s, IRR_HI)
+    f_lo = _npv(cf, lo)
+    ok = np.sign(f_lo) * np.sign(_npv(cf, hi)) < 0
+    r = np.where(ok, 0.01, np.nan)
+    passo_ant = hi - lo
+    ativos = np.flatnonzero(ok)
+    for _ in range(max_iter):
+        if ativos.size == 0:
+            break
+        c, ra = cf[ativos], r[ativos]
+        desc = (1.0 + ra)[:, None] ** -t
+        f = (c * desc).sum(axis=1)
+        df = (-t * c * desc).sum(axis=1) / (1.0 + ra)
+        # estreita o intervalo com o sinal do VPL no ponto atual
+        mesmo = np.sign(f) == np.sign(f_lo[ativos])
+        lo[ativos] = np.where(mesmo, ra, lo[ativos])
+        f_lo[ativos] = np.where(mesmo, f, f_lo[ativos])
+        hi[ativos] = np.where(mesmo, hi[ativos], ra)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            passo = f / df
+        novo = ra - passo
+        # bisseção quando Newton sai do intervalo ou não encolhe o passo pela metade
+        # (lado íngreme do VPL, onde Newton puro anda em passos minúsculos)
+        lento = ~np.isfinite(novo) | (novo <= lo[ativos]) | (novo >= hi[ativos]) | \
+            (np.abs(2.0 * passo) > np.abs(passo_ant[ativos]))
+        meio = 0.5 * (lo[ativos] + hi[ativos])
+        novo = np.where(lento, meio, novo)
+        passo_ant[ativos] = np.where(lento, hi[ativos] - lo[ativos], passo)
+        r[ativos] = novo
+        conv = (np.abs(novo - ra) <= tol * (1.0 + np.abs(ra))) | (f == 0) | \
+            (hi[ativos] - lo[ativos] <= tol * (1.0 + np.abs(novo)))
+        ativos = ativos[~conv]
+    return r
+
+
+def cashflow_timeline(sim: dict, plano: int = 0) -> pd.DataFrame:
+    """Timeline de um plano: Ano, Trimestre, Aporte, Aportado_Acum, Dividendos, Valor, Cota (TWR, base 1)."""
+    return pd.DataFrame({
+        "Ano": sim["anos"], "Trimestre": sim["trimestres"],
+        "Aporte": sim["aportes"][plano],
+        "Aportado_Acum": np.cumsum(sim["aportes"][plano]),
+        "Dividendos": sim["dividendos"][plano],
+        "Valor": sim["valor"][plano],
+        "Cota": np.cumprod(1.0 + sim["retorno"][plano]),
+    })
@@ -0,0 +1,196 @@
+"""
+Catálogo de bases: cada arquivo de src/ é lido UMA vez por processo e
+compartilhado (st.cache_resource) entre sessões e páginas. As visões de cada
+página (painel trimestral, snapshot mais recente, fatias por ticker, ...) são
+derivadas desse frame e também ficam em cache, então parse e memória não se
+multiplicam. Tudo que sai daqui é somente leitura: quem precisar alterar, copie.
+"""
+import os
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import controller.dataset as dataset
+
+
+BASE_FULL = "src/base_para_simulador_indicadores_refatorado.csv"
+BASE_MINIMAL = "src/base_para_simulador_indicadores_refatorado_minimal.csv"
+DATA_CUTOFF = "2025-05-01"  # datas a partir daqui são consideradas inválidas
+
+_versions = {}  # caminho -> (assinatura stat, versão)
+_versions_lock = threading.Lock()
+
+
+def source_signature(path: str) -> tuple:
+    """Assinatura barata do arquivo (tamanho + mtime do CSV e do .parquet ao lado)."""
+    sig = []
+    for p in (path, dataset.parquet_path(path)):
+        try:
+            stt = os.stat(p)
+            sig.append((stt.st_size, stt.st_mtime_ns))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+
+def _content_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def dataset_version(path: str) -> str:
+    """
+    Identificador da versão da base: hash do conteúdo do arquivo que será lido.
+    O hash só é recalculado quando tamanho/mtime mudam (stat é barato); um "touch"
+    sem mudança de conteúdo mantém a versão e, portanto, os caches.
+    Todos os caches derivados da base usam esta string como chave (nunca o DataFrame).
+    """
+    sig = source_signature(path)
+    with _versions_lock:
+        cached = _versions.get(path)
+    if cached is not None and cached[0] == sig:
+        return cached[1]
+    # hash fora do lock: consultas de outras bases não esperam a leitura deste arquivo
+    arquivo = dataset.source_file(path)
+    try:
+        versao = f"{os.path.basename(arquivo)}:{_content_hash(arquivo)}"
+    except OSError:
+        versao = f"{os.path.basename(arquivo)}:ausente"
+    with _versions_lock:
+        _versions[path] = (sig, versao)
+    return versao
+
+
+@st.cache_resource(show_spinner="Carregando base...", max_entries=4)
+def _load_source(path: str, version: str) -> pd.DataFrame:
+    df = dataset.read_dataset(path)
+    if "Data_Referencia" in df.columns:
+        df = df[df["Data_Referencia"] < DATA_CUTOFF].reset_index(drop=True)
+    return df
+
+
+def get_source(path: str) -> pd.DataFrame:
+    """
+    Frame completo e tipado do arquivo (já sem datas inválidas).
+    A chave inclui a versão da base (dataset_version): quando o ETL reescreve o
+    arquivo, a próxima leitura recarrega em vez de servir a versão antiga.
+    """
+    return _load_source(path, dataset_version(path))
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _view(path: str, version: str, name: str, _builder) -> object:
+    return _builder(_load_source(path, version))
+
+
+def view(path: str, name: str, _builder) -> object:
+    """
+    Visão derivada da base `path`, construída uma vez por versão do arquivo.
+    `name` identifica a visão no cache; `_builder(df_source)` a constrói
+    (o prefixo "_" faz o Streamlit não tentar hashear a função).
+    """
+    return _view(path, dataset_version(path), name, _builder)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _positions(path: str, version: str) -> dict:
+    df = _load_source(path, version)
+    if "Ticker" not in df.columns:
+        return {}
+    return {str(k): np.asarray(v) for k, v in df.groupby("Ticker", observed=True).indices.items()}
+
+
+def _ticker_positions(path: str) -> dict:
+    return _positions(path, dataset_version(path))
+
+
+def ticker_slice(path: str, ticker: str) -> pd.DataFrame:
+    """Linhas de um ticker (lookup em índice pré-computado, sem varrer a base)."""
+    version = dataset_version(path)  # mesma versão para frame e índice
+    df = _load_source(path, version)
+    pos = _positions(path, version).get(str(ticker).strip().upper())
+    if pos is None:
+        return df.iloc[0:0]
+    return df.take(pos)
+
+
+def tickers(path: str) -> list:
+    return sorted(_ticker_positions(path))
+
+
+def _latest_snapshot(df: pd.DataFrame) -> pd.DataFrame:
+    if "Data_Referencia" in df.columns:
+        idx = df.groupby("Ticker", observed=True)["Data_Referencia"].idxmax().dropna()
+        return df.loc[idx].sort_values("Ticker").reset_index(drop=True)
+    return df.drop_duplicates(subset=["Ticker"]).reset_index(drop=True)
+
+
+def latest_snapshot(path: str) -> pd.DataFrame:
+    """Última linha por Ticker (Data_Referencia mais recente)."""
+    return view(path, "latest_snapshot", _latest_snapshot)
+
+
+def _latest_by_period(df: pd.DataFrame, period_cols: tuple) -> dict:
+    """
+    Última linha de cada (Ticker, *period_cols), ordenada por ticker e período.
+    Escolha da linha: maior Data_Referencia (1ª ocorrência em empate); sem nenhuma
+    data no grupo, a última linha.
+    Retorna {"frame", "pos": (TICKER, *período) -> linha, "faixas": TICKER -> (início, fim)}.
+    """
+    if "Ticker" not in df.columns or any(c not in df.columns for c in period_cols):
+        return {"frame": df.iloc[0:0], "pos": {}, "faixas": {}}
+    ok = df["Ticker"].notna().to_numpy()
+    for c in period_cols:
+        ok &= df[c].notna().to_numpy()
+    pos = np.flatnonzero(ok)
+    tk = df["Ticker"].astype(str).to_numpy()[pos]
+    periodos = [df[c].to_numpy(dtype="int64", na_value=0)[pos] for c in period_cols]
+    if "Data_Referencia" in df.columns:
+        datas = df["Data_Referencia"].to_numpy()[pos]
+        tem = ~np.isnat(datas)
+        datas = np.where(tem, datas.astype("datetime64[ns]").astype("int64"), np.iinfo("int64").min)
+    else:
+        tem = np.zeros(len(pos), dtype=bool)
+        datas = np.zeros(len(pos), dtype="int64")
+    desempate = np.where(tem, -pos, pos)
+    ordem = np.lexsort((desempate, datas, tem, *periodos[::-1], tk))
+    tk_o = tk[ordem]
+    per_o = [p[ordem] for p in periodos]
+    fim = np.ones(len(ordem), dtype=bool)
+    novo = tk_o[1:] != tk_o[:-1]
+    for p in per_o:
+        novo |= p[1:] != p[:-1]
+    fim[:-1] = novo
+    frame = df.take(pos[ordem[fim]]).reset_index(drop=True)
+    tk_f = tk_o[fim]
+    chaves = zip(tk_f.tolist(), *(p[fim].tolist() for p in per_o))
+    uniq, ini = np.unique(tk_f, return_index=True)
+    fins = np.append(ini[1:], len(tk_f))
+    return {
+        "frame": frame,
+        "pos": {k: i for i, k in enumerate(chaves)},
+        "faixas": {t: (int(a), int(b)) for t, a, b in zip(uniq.tolist(), ini, fins)},
+    }
+
+
+def latest_row(path: str, ticker: str, fy: int) -> pd.Series:
+    """Linha mais recente do ticker no FY (lookup direto na tabela (Ticker, FY)); Series vazia se não houver."""
+    tab = view(path, "latest_by_ticker_fy", lambda df: _latest_by_period(df, ("FY",)))
+    i = tab["pos"].get((str(ticker).strip().upper(), int(fy)))
+    if i is None:
+        return pd.Series(dtype="float64")
+    return tab["frame"].iloc[i]
+
+
+def ticker_quarters(path: str, ticker: str) -> pd.DataFrame:
+    """Uma linha por trimestre (FY, FQ) do ticker, em ordem cronológica (fatia da tabela pré-indexada)."""
+    tab = view(path, "latest_by_ticker_fq", lambda df: _latest_by_period(df, ("FY", "FQ")))
+    faixa = tab["faixas"].get(str(ticker).strip().upper())
+    if faixa is None:
+        return tab["frame"].iloc[0:0]
+    return tab["frame"].iloc[faixa[0]:faixa[1]]
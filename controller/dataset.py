@@ -0,0 +1,96 @@
+"""
+Formato colunar (Parquet) das bases de indicadores.
+
+Os CSVs em src/ continuam sendo a fonte; `python -m controller.dataset src/*.csv`
+gera, ao lado de cada um, um .parquet com tipos já resolvidos:
+  - Ticker / Setor_Oficial_final como category
+  - Data_Referencia como datetime
+  - FY / FQ como inteiros pequenos
+O catálogo lê o .parquet quando ele existe e está atualizado (e o pyarrow está
+instalado); caso contrário cai no CSV com os mesmos tipos.
+"""
+import os
+import sys
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # formato colunar é opcional
+    pq = None
+
+
+CATEGORICAL_COLS = ("Ticker", "Setor_Oficial_final")
+
+
+def parquet_path(path_csv: str) -> str:
+    return os.path.splitext(path_csv)[0] + ".parquet"
+
+
+def _parquet_ok(path_csv: str) -> bool:
+    """Há .parquet utilizável e ele não é mais antigo que o CSV de origem?"""
+    pth = parquet_path(path_csv)
+    if pq is None or not os.path.exists(pth):
+        return False
+    if os.path.exists(path_csv) and os.path.getmtime(pth) < os.path.getmtime(path_csv):
+        return False
+    return True
+
+
+def source_file(path_csv: str) -> str:
+    """Arquivo que read_dataset vai efetivamente ler (o .parquet, se utilizável, ou o CSV)."""
+    return parquet_path(path_csv) if _parquet_ok(path_csv) else path_csv
+
+
+def apply_types(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza tipos das colunas-chave (mesma regra do conversor e do fallback CSV)."""
+    if "Ticker" in df.columns:
+        df["Ticker"] = df["Ticker"].astype(str).str.strip().str.upper()
+    if "Data_Referencia" in df.columns:
+        df["Data_Referencia"] = pd.to_datetime(df["Data_Referencia"], errors="coerce")
+        if "FY" not in df.columns:
+            df["FY"] = df["Data_Referencia"].dt.year
+        if "FQ" not in df.columns:
+            df["FQ"] = df["Data_Referencia"].dt.quarter
+    for c, dtype in (("FY", "Int16"), ("FQ", "Int8")):
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").round().astype(dtype)
+    for c in CATEGORICAL_COLS:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    return df
+
+
+def read_dataset(path_csv: str) -> pd.DataFrame:
+    """Lê a base inteira (Parquet se disponível, senão CSV) já tipada."""
+    pth = source_file(path_csv)
+    if pth != path_csv:
+        return pd.read_parquet(pth)
+    df = pd.read_csv(path_csv, encoding="utf-8-sig", low_memory=False)
+    return apply_types(df)
+
+
+def convert_csv_to_parquet(path_csv: str) -> str:
+    """Converte um CSV de src/ para Parquet tipado (ao lado do original). Retorna o caminho gerado."""
+    if pq is None:
+        raise ImportError("Conversão para Parquet requer o pacote 'pyarrow'.")
+    df = pd.read_csv(path_csv, encoding="utf-8-sig", low_memory=False)
+    df = apply_types(df)
+    # demais colunas numéricas em float (evita object por células vazias/strings)
+    for c in df.columns:
+        if df[c].dtype == object:
+            conv = pd.to_numeric(df[c], errors="coerce")
+            if conv.notna().sum() == df[c].notna().sum():
+                df[c] = conv
+    out = parquet_path(path_csv)
+    df.to_parquet(out, index=False, compression="zstd")
+    return out
+
+
+if __name__ == "__main__":
+    for p in sys.argv[1:] or ["src/base_para_simulador_indicadores_refatorado.csv",
+                              "src/base_para_simulador_indicadores_refatorado_minimal.csv"]:
+        if not os.path.exists(p):
+            print(f"ignorado (não encontrado): {p}")
+            continue
+        out = convert_csv_to_parquet(p)
+        print(f"{p} -> {out} ({os.path.getsize(p) / 1e6:.1f} MB -> {os.path.getsize(out) / 1e6:.1f} MB)")
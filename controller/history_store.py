@@ -0,0 +1,263 @@
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+import controller.ticker_search as ticker_search
+
+
+HISTORY_DB = "src/sim_history.sqlite"
+# arquivos antigos (um por página) importados uma única vez na criação do banco
+LEGACY_FILES = ("src/sim_history_store.csv", "src/sim_history.csv")
+
+# colunas persistidas (mesmas chaves do dict montado em utils.save_simulation_run)
+COLUMNS = {
+    "run_key": "TEXT PRIMARY KEY",
+    "sim_id": "TEXT",
+    "timestamp": "TEXT",
+    "base_fy": "INTEGER", "base_fq": "INTEGER",
+    "end_fy": "INTEGER", "end_fq": "INTEGER",
+    "tickers": "TEXT",
+    "n_tickers": "INTEGER",
+    "valor_inicial": "REAL",
+    "valor_final": "REAL",
+    "div_acum": "REAL",
+    "ret_total": "REAL",
+    "ret_sem_div": "REAL",
+    "cagr": "REAL",
+    "vol_anual": "REAL",
+    "hit_ratio": "REAL",
+    "max_dd": "REAL",
+}
+# campos que não contam como "mudança" da simulação (carimbos da execução)
+_VOLATILE = {"sim_id", "timestamp"}
+
+_lock = threading.Lock()
+_conns = {}      # caminho -> conexão
+_known = {}      # (caminho, run_key) -> conteúdo já gravado (evita ida ao banco no rerun)
+_ticker_idx = {} # caminho -> (versão do banco, índice de busca de tickers)
+
+
+def _clean(v):
+    """Normaliza valores para o SQLite (NaN/NA -> NULL, numpy -> tipos nativos)."""
+    if v is None:
+        return None
+    if isinstance(v, (float, np.floating)):
+        return float(v) if np.isfinite(v) else None
+    if isinstance(v, (np.integer,)):
+        return int(v)
+    try:
+        if pd.isna(v):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return v
+
+
+def _content(row: dict) -> tuple:
+    return tuple(_clean(row.get(c)) for c in COLUMNS if c not in _VOLATILE)
+
+
+def _import_legacy(conn: sqlite3.Connection):
+    for path in LEGACY_FILES:
+        if not os.path.exists(path):
+            continue
+        try:
+            dfh = pd.read_csv(path, encoding="utf-8-sig")
+        except Exception:
+            continue
+        for row in dfh.to_dict("records"):
+            if pd.isna(row.get("run_key")):
+                row["run_key"] = str(row.get("sim_id"))
+            _write(conn, row)
+    conn.commit()
+
+
+def _split_tickers(v) -> list:
+    if v is None or (isinstance(v, float) and not np.isfinite(v)):
+        return []
+    return sorted({t.strip().upper() for t in str(v).split(",") if t.strip()})
+
+
+def _write(conn: sqlite3.Connection, row: dict):
+    cols = list(COLUMNS)
+    sets = ", ".join(f"{c}=excluded.{c}" for c in cols if c != "run_key")
+    conn.execute(
+        f"INSERT INTO sim_runs ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+        f"ON CONFLICT(run_key) DO UPDATE SET {sets}",
+        [_clean(row.get(c)) for c in cols],
+    )
+    # índice invertido ticker -> simulação
+    key = row.get("run_key")
+    conn.execute("DELETE FROM sim_run_tickers WHERE run_key = ?", (key,))
+    conn.executemany(
+        "INSERT OR IGNORE INTO sim_run_tickers (ticker, run_key) VALUES (?, ?)",
+        [(t, key) for t in _split_tickers(row.get("tickers"))],
+    )
+
+
+def _create_schema(conn: sqlite3.Connection):
+    cols = ", ".join(f"{c} {t}" for c, t in COLUMNS.items())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS sim_runs ({cols})")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sim_run_tickers ("
+        "ticker TEXT NOT NULL, run_key TEXT NOT NULL, PRIMARY KEY (ticker, run_key)) WITHOUT ROWID"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_tickers_run ON sim_run_tickers (run_key)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_runs_base ON sim_runs (base_fy, base_fq)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_runs_end ON sim_runs (end_fy, end_fq)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_runs_ts ON sim_runs (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_runs_sim_id ON sim_runs (sim_id)")
+
+    # bancos criados antes do índice invertido: preenche a partir de sim_runs
+    vazio = conn.execute("SELECT 1 FROM sim_run_tickers LIMIT 1").fetchone() is None
+    if vazio:
+        rows = conn.execute("SELECT run_key, tickers FROM sim_runs").fetchall()
+        conn.executemany(
+            "INSERT OR IGNORE INTO sim_run_tickers (ticker, run_key) VALUES (?, ?)",
+            [(t, k) for k, v in rows for t in _split_tickers(v)],
+        )
+
+
+def connect(path: str = HISTORY_DB) -> sqlite3.Connection:
+    """Conexão compartilhada (por processo) com o banco do histórico; cria/migra na 1ª vez."""
+    with _lock:
+        conn = _conns.get(path)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        novo = not os.path.exists(path)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _create_schema(conn)
+        if novo:
+            _import_legacy(conn)
+        conn.commit()
+        _conns[path] = conn
+        return conn
+
+
+def upsert_run(row: dict, path: str = HISTORY_DB) -> bool:
+    """
+    Insere/atualiza a simulação pela chave run_key (busca pela PK).
+    Só escreve quando o conteúdo muda; reruns com o mesmo resultado não tocam no disco.
+    Retorna True se houve escrita.
+    """
+    key = row.get("run_key")
+    if not key:
+        return False
+    content = _content(row)
+    conn = connect(path)
+    with _lock:
+        if _known.get((path, key)) == content:
+            return False
+        cur = conn.execute(
+            f"SELECT {', '.join(c for c in COLUMNS if c not in _VOLATILE)} FROM sim_runs WHERE run_key = ?", (key,)
+        ).fetchone()
+        if cur is not None and tuple(_clean(v) for v in cur) == content:
+            _known[(path, key)] = content
+            return False
+        _write(conn, row)
+        conn.commit()
+        _known[(path, key)] = content
+        return True
+
+
+def load_runs(path: str = HISTORY_DB) -> pd.DataFrame:
+    """Todas as simulações salvas, como DataFrame (colunas de COLUMNS)."""
+    conn = connect(path)
+    with _lock:
+        return pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM sim_runs", conn)
+
+
+def ticker_index(path: str = HISTORY_DB) -> dict:
+    """
+    Índice de busca (ticker_search) sobre os tickers já simulados.
+    Reconstruído só quando o banco muda (commit desta ou de outra conexão).
+    """
+    conn = connect(path)
+    with _lock:
+        versao = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+        cached = _ticker_idx.get(path)
+        if cached is not None and cached[0] == versao:
+            return cached[1]
+        tickers = [r[0] for r in conn.execute("SELECT DISTINCT ticker FROM sim_run_tickers")]
+        idx = ticker_search.build_index(tickers)
+        _ticker_idx[path] = (versao, idx)
+        return idx
+
+
+def _where(base_fy=None, base_fq=None, end_fy=None, end_fq=None, term=None, min_tickers=None,
+           ret_range=None, date_range=None, sim_ids=None, path: str = HISTORY_DB) -> tuple:
+    """Traduz os filtros da página de Histórico em cláusula WHERE + parâmetros."""
+    conds, params = [], []
+    for col, val in (("base_fy", base_fy), ("base_fq", base_fq), ("end_fy", end_fy), ("end_fq", end_fq)):
+        if val is not None:
+            conds.append(f"{col} = ?")
+            params.append(int(val))
+    if term and str(term).strip():
+        # termo -> tickers pelo índice de busca; depois índice invertido ticker -> simulação
+        tks = ticker_search.match_tickers(ticker_index(path), term)
+        conds.append(f"run_key IN (SELECT run_key FROM sim_run_tickers WHERE ticker IN ({', '.join('?' * len(tks))}))"
+                     if tks else "0")
+        params += tks
+    if min_tickers is not None:
+        conds.append("n_tickers >= ?")
+        params.append(int(min_tickers))
+    if ret_range is not None:
+        lo, hi = ret_range
+        conds.append("ret_total * 100 >= ? AND ret_total * 100 <= ?")
+        params += [float(lo), float(hi)]
+    if date_range is not None:
+        d0, d1 = date_range
+        conds.append("timestamp >= ? AND timestamp < ?")
+        params += [f"{pd.Timestamp(d0):%Y-%m-%d}", f"{pd.Timestamp(d1) + pd.Timedelta(days=1):%Y-%m-%d}"]
+    if sim_ids is not None:
+        sim_ids = [str(x) for x in sim_ids]
+        conds.append(f"sim_id IN ({', '.join('?' * len(sim_ids))})" if sim_ids else "0")
+        params += sim_ids
+    return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+
+def query_runs(limit: int = None, offset: int = 0, path: str = HISTORY_DB, **filters) -> pd.DataFrame:
+    """
+    Simulações que atendem aos filtros (ver _where), mais recentes primeiro,
+    paginadas com LIMIT/OFFSET — o filtro roda no SQLite, não no pandas.
+    """
+    where, params = _where(path=path, **filters)
+    sql = f"SELECT {', '.join(COLUMNS)} FROM sim_runs{where} ORDER BY timestamp DESC, run_key"
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params += [int(limit), int(offset)]
+    conn = connect(path)
+    with _lock:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+def count_runs(path: str = HISTORY_DB, **filters) -> int:
+    where, params = _where(path=path, **filters)
+    conn = connect(path)
+    with _lock:
+        return int(conn.execute(f"SELECT COUNT(*) FROM sim_runs{where}", params).fetchone()[0])
+
+
+def run_stats(path: str = HISTORY_DB) -> dict:
+    """Domínios dos filtros (valores distintos e faixas) calculados no banco."""
+    conn = connect(path)
+    with _lock:
+        n, rmin, rmax, dmin, dmax = conn.execute(
+            "SELECT COUNT(*), MIN(ret_total * 100), MAX(ret_total * 100), MIN(timestamp), MAX(timestamp) FROM sim_runs"
+        ).fetchone()
+        distintos = {
+            c: [int(r[0]) for r in conn.execute(f"SELECT DISTINCT {c} FROM sim_runs WHERE {c} IS NOT NULL ORDER BY {c}")]
+            for c in ("base_fy", "base_fq", "end_fy", "end_fq")
+        }
+    return {
+        "n": int(n),
+        "ret_min": rmin, "ret_max": rmax,
+        "date_min": pd.to_datetime(dmin, errors="coerce"),
+        "date_max": pd.to_datetime(dmax, errors="coerce"),
+        **distintos,
+    }
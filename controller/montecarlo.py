@@ -0,0 +1,151 @@
+"""
+Cenários por bootstrap em blocos dos retornos trimestrais da carteira.
+
+O histórico do painel trimestral (build_qy_panel) vira uma matriz trimestre × ticker de
+retornos totais (preço + dividendos reinvestidos). Cada cenário sorteia blocos de
+trimestres INTEIROS (bootstrap circular em blocos), então a correlação entre os tickers
+num mesmo trimestre e a dependência de curto prazo dentro do bloco são preservadas.
+
+Tudo é vetorizado (cenários × trimestres) e semeado: os cenários são gerados em lotes de
+tamanho fixo, cada lote com sua semente derivada de SeedSequence(seed), então o resultado
+é o mesmo rodando em série ou no pool de processos (workers > 0, para corridas grandes).
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+PERCENTIS = (5, 25, 50, 75, 95)
+MIN_COBERTURA = 0.5            # fração mínima do peso com retorno para o trimestre entrar
+LOTE_ELEMENTOS = 4_000_000     # cenários × trimestres × tickers por lote (buy-and-hold)
+LOTE_MAX = 50_000              # cenários por lote
+
+
+def quarter_returns(mats: dict, weights: dict, min_cover: float = MIN_COBERTURA) -> dict:
+    """
+    Retornos totais trimestrais (preço + DPS) dos tickers da carteira em todo o painel.
+    weights: {ticker: peso} (normalizados aqui; tickers fora do painel são ignorados).
+
+    Trimestres em que os tickers com retorno somam menos de `min_cover` do peso ficam de
+    fora; nos demais, o retorno ausente de um ticker é preenchido com o da carteira
+    (pesos renormalizados entre os disponíveis) naquele trimestre.
+    Retorna dict com "tickers", "pesos", "retornos" (trimestres × tickers), "anos", "trimestres".
+    """
+    tickers, rows, pesos = [], [], []
+    for tck, w in weights.items():
+        t = str(tck).strip().upper()
+        i = mats["tk_pos"].get(t)
+        if i is None or not w > 0:
+            continue
+        tickers.append(t)
+        rows.append(i)
+        pesos.append(float(w))
+    if not rows:
+        raise ValueError("Nenhum ticker da carteira no painel.")
+    w = np.asarray(pesos) / np.sum(pesos)
+
+    preco = np.asarray(mats["preco"][rows], dtype="float64")
+    dps = np.asarray(mats["dps"][rows], dtype="float64")
+    ant, atual = preco[:, :-1], preco[:, 1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = (atual + np.where(np.isfinite(dps[:, 1:]), dps[:, 1:], 0.0)) / ant - 1.0
+    r = np.where(np.isfinite(r) & (ant > 0), r, np.nan).T            # trimestres × tickers
+
+    ok = np.isfinite(r)
+    cobertura = ok @ w
+    with np.errstate(invalid="ignore"):
+        r_cart = np.where(ok, r, 0.0) @ w / cobertura
+    manter = cobertura >= min_cover
+    r = np.where(ok, r, r_cart[:, None])[manter]
+    return {
+        "tickers": tickers, "pesos": w, "retornos": r,
+        "anos": mats["anos"][1:][manter], "trimestres": mats["tris"][1:][manter],
+    }
+
+
+def _block_indices(rng, n_paths: int, horizon: int, n_hist: int, block: int) -> np.ndarray:
+    """Índices (cenários × horizonte) do bootstrap circular: blocos de `block` trimestres seguidos."""
+    n_blocos = -(-horizon // block)
+    inicio = rng.integers(0, n_hist, size=(n_paths, n_blocos))
+    idx = (inicio[:, :, None] + np.arange(block)) % n_hist
+    return idx.reshape(n_paths, n_blocos * block)[:, :horizon]
+
+
+def _simulate_chunk(retornos: np.ndarray, pesos: np.ndarray, n_paths: int, horizon: int,
+                    block: int, rebalance: bool, seed) -> np.ndarray:
+    """Crescimento acumulado (cenários × horizonte+1, começa em 1) de um lote de cenários."""
+    rng = np.random.default_rng(seed)
+    idx = _block_indices(rng, n_paths, horizon, len(retornos), block)
+    cresc = np.ones((n_paths, horizon + 1))
+    if rebalance:
+        # pesos constantes: só o retorno da carteira no trimestre importa
+        r_cart = retornos @ pesos
+        np.cumprod(1.0 + r_cart[idx], axis=1, out=cresc[:, 1:])
+    else:
+        # buy-and-hold: cada ticker cresce com os próprios retornos, pesos derivam
+        cresc[:, 1:] = np.cumprod(1.0 + retornos[idx], axis=1) @ pesos
+    return cresc
+
+
+def bootstrap_paths(qr: dict, n_paths: int, horizon: int = 40, block: int = 4, seed: int = 0,
+                    rebalance: bool = False, workers: int = 0) -> np.ndarray:
+    """
+    Crescimento da carteira em `n_paths` cenários de `horizon` trimestres (matriz
+    n_paths × (horizon+1), coluna 0 = 1). qr: saída de quarter_returns.
+    rebalance: volta aos pesos iniciais todo trimestre (senão, buy-and-hold).
+    workers > 0: distribui os lotes num ProcessPoolExecutor (mesmo resultado que em série).
+    """
+    retornos, pesos = qr["retornos"], qr["pesos"]
+    if len(retornos) < block:
+        raise ValueError(f"Histórico com {len(retornos)} trimestres; mínimo de {block} para o bloco.")
+    por_cenario = horizon * (1 if rebalance else len(pesos))
+    lote = int(min(LOTE_MAX, max(1, LOTE_ELEMENTOS // max(por_cenario, 1))))
+    tamanhos = [min(lote, n_paths - i) for i in range(0, n_paths, lote)]
+    sementes = np.random.SeedSequence(seed).spawn(len(tamanhos))
+    args = [(retornos, pesos, n, horizon, block, rebalance, s) for n, s in zip(tamanhos, sementes)]
+
+    if workers and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            partes = list(ex.map(_simulate_chunk, *zip(*args)))
+    else:
+        partes = [_simulate_chunk(*a) for a in args]
+    return np.concatenate(partes, axis=0) if partes else np.ones((0, horizon + 1))
+
+
+def path_metrics(cresc: np.ndarray) -> dict:
+    """Por cenário e trimestre h: "valor" (crescimento), "cagr" até h e "max_dd" até h."""
+    h = np.arange(cresc.shape[1], dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = cresc ** (4.0 / np.where(h > 0, h, np.nan)) - 1.0
+    dd = cresc / np.maximum.accumulate(cresc, axis=1) - 1.0
+    return {"valor": cresc, "cagr": cagr, "max_dd": np.minimum.accumulate(dd, axis=1)}
+
+
+def fan(cresc: np.ndarray, valor_inicial: float = 1.0, percentis=PERCENTIS) -> pd.DataFrame:
+    """
+    Leque de percentis por trimestre do horizonte (formato longo):
+    Trimestre, Metrica ("Valor", "CAGR", "Max_DD"), Percentil, Valor.
+    """
+    mets = path_metrics(cresc)
+    nomes = {"valor": "Valor", "cagr": "CAGR", "max_dd": "Max_DD"}
+    h = np.arange(1, cresc.shape[1])
+    partes = []
+    for k, nome in nomes.items():
+        # trimestre × cenário contíguo: percentil ao longo das linhas é bem mais rápido
+        m = np.ascontiguousarray(mets[k][:, 1:].T)
+        q = np.percentile(m, percentis, axis=1)                     # percentis × horizonte
+        partes.append(pd.DataFrame({
+            "Trimestre": np.tile(h, len(percentis)),
+            "Metrica": nome,
+            "Percentil": np.repeat(percentis, len(h)),
+            "Valor": q.ravel() * (valor_inicial if k == "valor" else 1.0),
+        }))
+    return pd.concat(partes, ignore_index=True)
+
+
+def final_summary(leque: pd.DataFrame) -> pd.DataFrame:
+    """Percentis no fim do horizonte (a partir do leque): linhas = Percentil; colunas Valor_Final, CAGR, Max_DD."""
+    fim = leque[leque["Trimestre"] == leque["Trimestre"].max()]
+    out = fim.pivot(index="Percentil", columns="Metrica", values="Valor")
+    return out.rename(columns={"Valor": "Valor_Final"})[["Valor_Final", "CAGR", "Max_DD"]].reset_index().rename_axis(columns=None)
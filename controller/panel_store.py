@@ -0,0 +1,200 @@
+"""
+Artefato persistente do painel trimestral (Ticker, FY, FQ).
+
+Ao lado de cada base fica um `<base>.qy_panel.parquet` com o painel já agregado e, nos
+metadados do próprio arquivo, uma impressão digital do conteúdo de cada ticker na
+origem (nº de linhas + hash das linhas, na ordem). Na recarga só os tickers cuja
+impressão mudou (trimestres novos, linhas incluídas/removidas, valores corrigidos) ou
+que surgiram são reagregados e mesclados ao painel salvo: um refresh de rotina do ETL
+custa proporcional ao delta. Sem pyarrow o painel não é persistido.
+
+As matrizes densas usadas pelo motor de simulação também são materializadas em
+`<base>.qy_mats/<versão>/*.npy` e abertas com memória mapeada (ver open_matrices).
+"""
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # persistência do painel é opcional
+    pa = pq = None
+
+
+PANEL_VERSION = 1  # muda quando o formato/regra de agregação muda (invalida artefatos antigos)
+PANEL_KEYS = ["Ticker", "FY", "FQ"]
+
+
+def panel_path(path_csv: str) -> str:
+    return os.path.splitext(path_csv)[0] + ".qy_panel.parquet"
+
+
+def ticker_fingerprints(df: pd.DataFrame) -> dict:
+    """
+    Impressão digital do conteúdo de cada ticker: "nº de linhas:hash", com o hash de cada
+    linha (todas as colunas exceto Ticker) ponderado pela posição dentro do ticker, então
+    valores corrigidos e linhas reordenadas também mudam a impressão.
+    """
+    if df.empty:
+        return {}
+    codes, tickers = pd.factorize(df["Ticker"])     # categoria: usa os códigos, sem converter para str
+    linhas = pd.util.hash_pandas_object(df.drop(columns="Ticker"), index=False).to_numpy()
+    pos = pd.Series(codes).groupby(codes, sort=False).cumcount().to_numpy(dtype="uint64")
+    with np.errstate(over="ignore"):                 # aritmética módulo 2**64
+        pesos = linhas * (2 * pos + np.uint64(1))
+    resumo = pd.Series(pesos).groupby(codes, sort=False).agg(["size", "sum"])
+    return {str(tickers[i]): f"{n}:{int(h):016x}" for i, n, h in
+            zip(resumo.index, resumo["size"], resumo["sum"])}
+
+
+_META_KEY = b"qy_panel"
+
+
+def _load(path: str):
+    """Artefato {version, columns, fingerprints, panel} do .parquet (None se ausente/inválido)."""
+    if pq is None or not os.path.exists(path):
+        return None
+    try:
+        tabela = pq.read_table(path)
+        art = json.loads(tabela.schema.metadata[_META_KEY])
+    except Exception:  # corrompido/formato antigo -> reconstrói
+        return None
+    if not isinstance(art, dict) or art.get("version") != PANEL_VERSION:
+        return None
+    art["panel"] = tabela.to_pandas()
+    return art
+
+
+def _save(path: str, art: dict):
+    """Grava o painel em Parquet com o resto do artefato nos metadados do esquema (um arquivo só)."""
+    if pq is None:
+        return
+    meta = {k: v for k, v in art.items() if k != "panel"}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        tabela = pa.Table.from_pandas(art["panel"], preserve_index=False)
+        tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}),
+                                                 _META_KEY: json.dumps(meta).encode("utf-8")})
+        pq.write_table(tabela, tmp, compression="zstd")
+        os.replace(tmp, path)  # troca atômica (vários workers podem gravar)
+    except (OSError, pa.ArrowException):
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return
+    # artefato do formato anterior (pickle) não é mais lido
+    legado = path[: -len(".parquet")] + ".pkl"
+    if os.path.exists(legado):
+        try:
+            os.remove(legado)
+        except OSError:
+            pass
+
+
+def _align_tickers(panel: pd.DataFrame, df_src: pd.DataFrame) -> pd.DataFrame:
+    """Mesmas categorias de Ticker da base (igual ao painel reconstruído do zero)."""
+    if isinstance(df_src["Ticker"].dtype, pd.CategoricalDtype):
+        cats = df_src["Ticker"].cat.categories
+        panel["Ticker"] = pd.Categorical(panel["Ticker"].astype(str), categories=cats)
+    return panel
+
+
+def update_panel(path_csv: str, df_src: pd.DataFrame, build) -> pd.DataFrame:
+    """
+    Painel de `df_src` (já projetado nas colunas usadas) reaproveitando o artefato salvo.
+    build(df) -> painel: agregação completa, aplicada só ao subconjunto de tickers alterados.
+    """
+    fps = ticker_fingerprints(df_src)
+    cols = list(df_src.columns)
+    pth = panel_path(path_csv)
+    art = _load(pth)
+
+    if art is None or art.get("columns") != cols:
+        panel = build(df_src)
+        _save(pth, {"version": PANEL_VERSION, "columns": cols, "fingerprints": fps, "panel": panel})
+        return panel
+
+    antigos = art["fingerprints"]
+    alterados = [t for t, fp in fps.items() if antigos.get(t) != fp]
+    removidos = [t for t in antigos if t not in fps]
+    if not alterados and not removidos:
+        return _align_tickers(art["panel"], df_src)
+
+    panel = art["panel"]
+    tickers_panel = panel["Ticker"].astype(str)
+    manter = panel[~tickers_panel.isin(alterados + removidos)]
+    partes = [manter]
+    if alterados:
+        sub = df_src[df_src["Ticker"].astype(str).isin(alterados)]
+        partes.append(build(sub))
+    panel = pd.concat([p.assign(Ticker=p["Ticker"].astype(str)) for p in partes], ignore_index=True)
+    panel = panel.sort_values(PANEL_KEYS, kind="mergesort").reset_index(drop=True)
+    panel = _align_tickers(panel, df_src)
+
+    _save(pth, {"version": PANEL_VERSION, "columns": cols, "fingerprints": fps, "panel": panel})
+    return panel
+
+
+# ---------------------------------------------------------------------------
+# Matrizes densas Ticker × Trimestre em .npy, abertas via memória mapeada.
+# Vários workers do Streamlit mapeiam os mesmos arquivos: uma única cópia no
+# page cache do SO, e um worker novo abre o painel sem ler o CSV.
+# ---------------------------------------------------------------------------
+MATRIX_NAMES = ("preco", "acoes", "dps", "dy")
+
+
+def matrices_dir(path_csv: str, version: str) -> str:
+    """Diretório das matrizes para esta versão da base (version = catalog.dataset_version)."""
+    tag = hashlib.sha1(str(version).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(os.path.splitext(path_csv)[0] + ".qy_mats", tag)
+
+
+def write_matrices(path_csv: str, version: str, mats: dict):
+    """Grava tickers/qkeys/matrizes (+ meta) e publica o diretório de forma atômica."""
+    dst = matrices_dir(path_csv, version)
+    if os.path.isdir(dst):
+        return
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(tmp, exist_ok=True)
+        np.save(os.path.join(tmp, "tickers.npy"), np.asarray(mats["tickers"], dtype=str))
+        np.save(os.path.join(tmp, "qkeys.npy"), np.asarray(mats["qkeys"], dtype="int64"))
+        for name in MATRIX_NAMES:
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(mats[name], dtype="float64"))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": PANEL_VERSION, "fingerprint": mats.get("fingerprint")}, f)
+        os.rename(tmp, dst)
+    except OSError:  # outro worker publicou antes, ou disco somente leitura
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+    # versões antigas da mesma base não são mais lidas
+    raiz = os.path.dirname(dst)
+    for d in os.listdir(raiz):
+        if d != os.path.basename(dst) and not d.endswith(".tmp"):
+            shutil.rmtree(os.path.join(raiz, d), ignore_errors=True)
+
+
+def open_matrices(path_csv: str, version: str):
+    """
+    Abre as matrizes desta versão da base como memmap somente leitura.
+    Retorna dict (tickers, qkeys, preco, acoes, dps, dy, fingerprint) ou None se não existirem.
+    """
+    src = matrices_dir(path_csv, version)
+    try:
+        with open(os.path.join(src, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != PANEL_VERSION:
+            return None
+        out = {
+            "tickers": np.load(os.path.join(src, "tickers.npy")).astype(object),
+            "qkeys": np.load(os.path.join(src, "qkeys.npy")),
+            "fingerprint": meta.get("fingerprint"),
+        }
+        for name in MATRIX_NAMES:
+            out[name] = np.load(os.path.join(src, f"{name}.npy"), mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    return out
@@ -0,0 +1,100 @@
+"""
+Motor de filtros por faixa (sliders de "Filtros Avançados" da Lista).
+
+Para cada coluna numérica do snapshot pré-computa os limites do slider e um índice
+ordenado (posições das linhas ordenadas pelo valor + posições com NaN). Avaliar as
+faixas ativas vira um searchsorted por coluna e uma única máscara booleana, sem
+copiar o frame a cada slider.
+"""
+import numpy as np
+import pandas as pd
+
+
+SLIDER_MAX = 100.0                          # teto dos sliders; no teto o filtro superior é ignorado
+RATIO_COLS = ("ROE", "ROA", "ROIC")         # indicadores em fração: slider vai até 1.0
+
+
+def slider_bounds(values: np.ndarray, col: str):
+    """(min, max, step) do slider para a coluna, ou None se não há valores."""
+    v = values[~np.isnan(values)]
+    if v.size == 0:
+        return None
+    min_val, max_val = float(v.min()), float(v.max())
+    if min_val < 0:
+        min_val = 0.0
+    if col in RATIO_COLS:
+        max_val = 1.0
+    if max_val > SLIDER_MAX:
+        max_val = SLIDER_MAX
+    step = (max_val - min_val) / 100 if max_val != min_val else 1.0
+    return min_val, max_val, step
+
+
+def build_range_index(df: pd.DataFrame, cols=None) -> dict:
+    """
+    Índice das colunas numéricas (float64/int64) de `df` — ou de `cols` —
+    com limites do slider e valores ordenados. Posições referem-se às linhas de `df`.
+    """
+    if cols is None:
+        cols = df.select_dtypes(include=["float64", "int64"]).columns.tolist()
+    index = {"n": len(df), "cols": {}}
+    for col in cols:
+        values = df[col].to_numpy(dtype="float64", na_value=np.nan)
+        bounds = slider_bounds(values, col)
+        if bounds is None:
+            continue
+        nan = np.isnan(values)
+        pos = np.flatnonzero(~nan)
+        order = np.argsort(values[pos], kind="stable")
+        index["cols"][col] = {
+            "bounds": bounds,
+            "sorted": values[pos][order],
+            "order": pos[order],
+            "nan": np.flatnonzero(nan),
+        }
+    return index
+
+
+def range_mask(index: dict, ranges: dict) -> np.ndarray:
+    """
+    Máscara única (uma posição por linha do frame indexado) para as faixas {col: (lo, hi)}.
+    Mesma regra dos sliders da Lista:
+      - lo == 0 não filtra; senão mantém valor >= lo ou NaN;
+      - hi == SLIDER_MAX não filtra; senão mantém valor <= hi (NaN sai).
+    """
+    mask = np.ones(index["n"], dtype=bool)
+    for col, (lo, hi) in ranges.items():
+        ix = index["cols"].get(col)
+        if ix is None:
+            continue
+        if lo != 0:
+            k = np.searchsorted(ix["sorted"], lo, side="left")
+            mask[ix["order"][:k]] = False
+        if hi != SLIDER_MAX:
+            k = np.searchsorted(ix["sorted"], hi, side="right")
+            mask[ix["order"][k:]] = False
+            mask[ix["nan"]] = False
+    return mask
+
+
+def sort_order(index: dict, df: pd.DataFrame, col: str, desc: bool = False) -> np.ndarray:
+    """
+    Posições das linhas de `df` (o frame indexado) ordenadas por `col`, NaN por último.
+    Colunas numéricas reaproveitam a ordem já guardada no índice; as demais ordenam na hora
+    (numéricas fora do índice, como Int16/Int8 anuláveis, por valor; texto/categoria por str).
+    """
+    ix = index["cols"].get(col)
+    if ix is not None:
+        order = ix["order"][::-1] if desc else ix["order"]
+        return np.concatenate([order, ix["nan"]])
+    s = df[col]
+    nan = s.isna().to_numpy()
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        vals = s.to_numpy(dtype="float64", na_value=np.nan)
+    else:
+        vals = s.astype(str).to_numpy()
+    pos = np.flatnonzero(~nan)
+    order = pos[np.argsort(vals[pos], kind="stable")]
+    if desc:
+        order = order[::-1]
+    return np.concatenate([order, np.flatnonzero(nan)])
@@ -0,0 +1,92 @@
+"""
+Cubo de estatísticas setoriais (página Análise).
+
+Para cada setor x período x indicador guarda média, mediana, p25, p75 e contagem
+de valores válidos. Há duas granularidades: anual (setor, FY) para os cards e
+trimestral (setor, FY, FQ) para séries temporais. O cubo é montado uma vez por
+versão da base (via catalog.view em utils) e a página só faz lookups nele.
+"""
+import numpy as np
+import pandas as pd
+
+
+STATS = ("mean", "median", "p25", "p75", "count")
+KEY_COLS = ("Ticker", "Data_Referencia", "FY", "FQ", "Ano", "Trimestre")
+DPS_PARTS = ("Dividendos_FY", "Juros_Sobre_Capital_Proprio_FY", "Acoes_Emitidas")
+
+
+def _indicators(df: pd.DataFrame, sector_col: str) -> pd.DataFrame:
+    """Colunas de indicadores já numéricas (object é coagido; categorias/datas ficam de fora)."""
+    out = {}
+    for c in df.columns:
+        if c in KEY_COLS or c == sector_col:
+            continue
+        s = df[c]
+        if isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_datetime64_any_dtype(s):
+            continue
+        if s.dtype == object:
+            s = pd.to_numeric(s, errors="coerce")
+        elif not pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+            continue
+        s = s.astype("float64")
+        if s.notna().any():
+            out[c] = s
+    # DPS composto (mesmo fallback do card de proventos) quando a base não traz DPS_FY
+    if "DPS_FY" not in df.columns and all(c in df.columns for c in DPS_PARTS):
+        num = pd.to_numeric(df[DPS_PARTS[0]], errors="coerce").fillna(0) + \
+            pd.to_numeric(df[DPS_PARTS[1]], errors="coerce").fillna(0)
+        den = pd.to_numeric(df[DPS_PARTS[2]], errors="coerce")
+        out["DPS_FY"] = (num / den.replace(0, np.nan)).astype("float64")
+    return pd.DataFrame(out, index=df.index)
+
+
+def build_cube(df: pd.DataFrame, sector_col: str, quarterly: bool = False) -> pd.DataFrame:
+    """
+    Cubo longo indexado por (setor, FY[, FQ], indicador) com as colunas de STATS.
+    Linhas sem setor ou período ficam de fora (como no filtro setor == valor da página).
+    """
+    keys = [sector_col, "FY"] + (["FQ"] if quarterly else [])
+    if any(k not in df.columns for k in keys):
+        return pd.DataFrame(columns=list(STATS))
+    num = _indicators(df, sector_col)
+    if num.empty:
+        return pd.DataFrame(columns=list(STATS))
+    grp = [df[k].astype(object) if isinstance(df[k].dtype, pd.CategoricalDtype) else df[k] for k in keys]
+    g = num.groupby(grp, observed=True, sort=True)
+    partes = {
+        "mean": g.mean(),
+        "median": g.median(),
+        "p25": g.quantile(0.25),
+        "p75": g.quantile(0.75),
+        "count": g.count(),
+    }
+    cube = pd.concat({k: v.stack(future_stack=True) for k, v in partes.items()}, axis=1)
+    cube.index = cube.index.set_names(keys + ["indicador"])
+    cube["count"] = cube["count"].astype("int64")
+    return cube.sort_index()
+
+
+def lookup(cube: pd.DataFrame, *key) -> pd.DataFrame:
+    """Estatísticas (indicador x STATS) de um setor/período; frame vazio se não houver."""
+    if cube.empty:
+        return cube.iloc[0:0]
+    try:
+        return cube.loc[key]
+    except (KeyError, TypeError):
+        return cube.iloc[0:0]
+
+
+def stat(stats: pd.DataFrame, col: str, name: str = "mean") -> float:
+    """Valor de uma estatística para o indicador (NaN se ausente ou sem valores)."""
+    if col not in stats.index or stats.at[col, "count"] == 0:
+        return np.nan
+    return float(stats.at[col, name])
+
+
+def series(cube: pd.DataFrame, sector, col: str, name: str = "median") -> pd.Series:
+    """Série trimestral (índice (FY, FQ)) de uma estatística do setor para o indicador."""
+    sub = lookup(cube, sector)
+    if sub.empty:
+        return pd.Series(dtype="float64")
+    sub = sub.xs(col, level="indicador", drop_level=True) if col in sub.index.get_level_values("indicador") else sub.iloc[0:0]
+    return sub[name].astype("float64")
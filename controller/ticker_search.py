@@ -0,0 +1,88 @@
+"""
+Índice de busca de tickers (compartilhado pela Lista e pelo Histórico).
+
+Montado uma vez por universo de tickers: lista ordenada de tickers únicos, posições
+das linhas de cada um e trigramas -> tickers. A busca é por trecho do ticker
+(case-insensitive, como o antigo str.contains), candidatos via trigramas; sem
+nenhum acerto exato, cai numa busca aproximada pela fração de trigramas em comum.
+"""
+import numpy as np
+
+
+FUZZY_MIN_SCORE = 0.5   # fração mínima de trigramas do termo presentes no ticker
+
+
+def _norm(term) -> str:
+    return str(term).strip().upper()
+
+
+def _trigrams(s: str) -> set:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def build_index(tickers) -> dict:
+    """
+    tickers: sequência alinhada às linhas do frame (pode repetir).
+    Retorna dict com "n" (nº de linhas), "tickers" (únicos ordenados),
+    "pos" (ticker -> id), "rows" (posições por ticker) e "tri" (trigrama -> ids dos tickers).
+    """
+    arr = np.asarray([_norm(t) for t in tickers], dtype=object)
+    if len(arr) == 0:
+        return {"n": 0, "tickers": [], "pos": {}, "rows": [], "tri": {}}
+    uniq, inv = np.unique(arr, return_inverse=True)
+    order = np.argsort(inv, kind="stable")
+    cortes = np.cumsum(np.bincount(inv, minlength=len(uniq)))[:-1]
+    tri = {}
+    for i, t in enumerate(uniq):
+        for g in _trigrams(t):
+            tri.setdefault(g, []).append(i)
+    return {
+        "n": len(arr),
+        "tickers": list(uniq),
+        "pos": {t: i for i, t in enumerate(uniq)},
+        "rows": np.split(order, cortes),
+        "tri": {g: np.asarray(ids) for g, ids in tri.items()},
+    }
+
+
+def match_tickers(index: dict, term, fuzzy: bool = True) -> list:
+    """
+    Tickers (únicos) que casam com o termo: todos que contêm o termo
+    (ex.: "PETR" -> PETR3, PETR4); se nenhum e fuzzy, os mais parecidos por trigramas.
+    """
+    t = _norm(term)
+    tickers = index["tickers"]
+    if not t:
+        return list(tickers)
+
+    grams = _trigrams(t)
+    if grams:
+        postings = [index["tri"].get(g) for g in grams]
+        if all(p is not None for p in postings):
+            cand = postings[0]
+            for p in postings[1:]:
+                cand = np.intersect1d(cand, p, assume_unique=True)
+        else:
+            cand = []
+    else:
+        cand = range(len(tickers))  # termo curto (< 3 letras): confere todos
+    achados = [tickers[i] for i in cand if t in tickers[i]]
+    if achados or not fuzzy or not grams:
+        return sorted(achados)
+
+    # aproximada: conta trigramas em comum por ticker
+    score = {}
+    for g in grams:
+        for i in index["tri"].get(g, ()):
+            score[i] = score.get(i, 0) + 1
+    minimo = FUZZY_MIN_SCORE * len(grams)
+    melhores = sorted((-s, tickers[i]) for i, s in score.items() if s >= minimo)
+    return [tk for _, tk in melhores]
+
+
+def search(index: dict, term, fuzzy: bool = True) -> np.ndarray:
+    """Posições (ordenadas) das linhas cujo ticker casa com o termo."""
+    ids = [index["pos"][tk] for tk in match_tickers(index, term, fuzzy=fuzzy)]
+    if not ids:
+        return np.array([], dtype=int)
+    return np.sort(np.concatenate([index["rows"][i] for i in ids]))
@@ -3,19 +3,38 @@ import streamlit as st
 import pandas as pd
 # from typing import List
 import numpy as np
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+import controller.history_store as history_store
+import controller.catalog as catalog
+import controller.panel_store as panel_store
+import controller.screener as screener
+import controller.sector_stats as sector_stats
+import controller.ticker_search as ticker_search
 # from st_aggrid import AgGrid, GridOptionsBuilder
 # import re
 # import altair as alt
 # import os
 
 
-HISTORY_FILE = "src/sim_history_store.csv"
+# matrizes por painel (id do frame -> (weakref do frame, matrizes)); ver build_qy_matrices
+_MATS_BY_FRAME = {}
+_MATS_LOCK = threading.Lock()
+# cache de resultados de simulação (por processo, LRU)
+SIM_CACHE_MAX_ENTRIES = 64
+SIM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# índices por período da Lista (faixas, busca) mantidos por tipo de índice
+LISTA_PERIODOS_MAX = 24
 # quais filtros mapeiam para querystring
 FILTER_STATE_MAP = {
     "filtro_ano": "fy",
     "filtro_tri": "fq",
     "filtro_setor": "sector",
     "filtro_busca": "q",
+    "grid_cols": "cols",    # colunas visíveis da tabela da Lista (separadas por vírgula)
+    "grid_sort": "sort",    # coluna de ordenação da tabela ("-" na frente = decrescente)
 }
 
 def _norm_year(x):
@@ -71,23 +90,16 @@ def reset_portfolio_on_period_change():
         st.session_state["_periodo_lock_portfolio"] = atual
         st.session_state["_portfolio_reset_message"] = f"Carteira resetada ao alterar o período (Ano={atual[0] if atual[0] is not None else 'Selecione'}, Trim={atual[1] if atual[1] is not None else 'Selecione'})."
 
-def _latest_row(df_year: pd.DataFrame) -> pd.Series:
-    if df_year.empty:
-        return pd.Series(dtype="float64")
-    if "Data_Referencia" in df_year.columns and df_year["Data_Referencia"].notna().any():
-        i = df_year["Data_Referencia"].idxmax()
-        return df_year.loc[i]
-    return df_year.iloc[-1]
-
 def _to_num(x):
     try:
         return float(pd.to_numeric(x, errors="coerce"))
     except Exception:
         return np.nan
 
-def _get_pair(df_cur: pd.DataFrame, df_prev: pd.DataFrame, col: str) -> tuple:
-    v_cur = _to_num(_latest_row(df_cur).get(col, np.nan))
-    v_prev = _to_num(_latest_row(df_prev).get(col, np.nan))
+def _get_pair(row_cur: pd.Series, row_prev: pd.Series, col: str) -> tuple:
+    """(FY, FY-1) de um indicador a partir das linhas já resolvidas (catalog.latest_row)."""
+    v_cur = _to_num(row_cur.get(col, np.nan))
+    v_prev = _to_num(row_prev.get(col, np.nan))
     return v_cur, v_prev
 
 
@@ -103,16 +115,31 @@ def apply_period_watchers():
     lock_period_if_portfolio_filled()
     reset_portfolio_on_period_change()
   
-@st.cache_data(show_spinner=False)
+# colunas lidas para o painel trimestral (inclui aliases; ausentes são ignoradas)
+QY_SOURCE_COLS = ["Ticker", "Data_Referencia",
+                  "Preco_Atual", "Preco", "Close",
+                  "Acoes_Emitidas", "Qtde_Acoes", "Acoes",
+                  "Dividendos", "Juros_Sobre_Capital_Proprio"]
+
 def build_qy_panel(path_csv: str) -> pd.DataFrame:
-    df = pd.read_csv(path_csv, encoding="utf-8-sig")
-    if "Data_Referencia" not in df.columns:
+    """
+    Painel trimestral (Ticker, FY, FQ) derivado da base compartilhada do catálogo.
+    Reaproveita o artefato persistido (panel_store): só tickers alterados são reagregados.
+    """
+    def _incremental(df_src: pd.DataFrame) -> pd.DataFrame:
+        df_src = df_src[[c for c in QY_SOURCE_COLS if c in df_src.columns]]
+        return panel_store.update_panel(path_csv, df_src, _build_qy_panel)
+
+    return catalog.view(path_csv, "qy_panel", _incremental)
+
+
+def _build_qy_panel(df_src: pd.DataFrame, agg=None) -> pd.DataFrame:
+    """agg: função de agregação por (Ticker, FY, FQ); padrão _aggregate_qy."""
+    if "Data_Referencia" not in df_src.columns:
         raise ValueError("Base sem coluna 'Data_Referencia'.")
 
-    # normaliza
-    df["Ticker"] = df["Ticker"].astype(str).str.strip().str.upper()
-    df["Data_Referencia"] = pd.to_datetime(df["Data_Referencia"], errors="coerce")
-    df = df[df["Data_Referencia"] < "2025-05-01"]  # filtra datas inválidas
+    # só as colunas usadas (Ticker/Data_Referencia já tipados e datas filtradas pelo catálogo)
+    df = df_src[[c for c in QY_SOURCE_COLS if c in df_src.columns]].copy()
     df["FY"] = df["Data_Referencia"].dt.year
     df["FQ"] = df["Data_Referencia"].dt.quarter
 
@@ -131,57 +158,40 @@ def build_qy_panel(path_csv: str) -> pd.DataFrame:
     if col_preco is None:
         raise ValueError("Não encontrei coluna de preço (ex.: 'Preco_Atual', 'Preco' ou 'Close').")
 
-    # helpers sem min_count
-    def _safe_mean(s: pd.Series):
-        s = pd.to_numeric(s, errors="coerce")
-        return s.mean() if s.notna().any() else np.nan
-
-    def _safe_sum(s: pd.Series):
-        s = pd.to_numeric(s, errors="coerce")
-        return s.sum() if s.notna().any() else np.nan
-
-    def _last_non_null(s: pd.Series):
-        s = pd.to_numeric(s, errors="coerce").ffill()
-        return s.iloc[-1] if s.notna().any() else np.nan
-
-    gb = df.sort_values(["Ticker", "Data_Referencia"]).groupby(["Ticker", "FY", "FQ"], group_keys=False)
-
-    preco_qy = gb[col_preco].apply(_safe_mean)                      # média do preço no trimestre
-    acoes_qy = gb[col_acoes].apply(_last_non_null) if col_acoes else pd.Series(np.nan, index=preco_qy.index)
-    divid_qy = gb[col_div].apply(_safe_sum)   if col_div else pd.Series(0.0, index=preco_qy.index)
-    jcp_qy   = gb[col_jcp].apply(_safe_sum)   if col_jcp  else pd.Series(0.0, index=preco_qy.index)
-
-    out = (
-        pd.DataFrame({
-            "Preco_QY": preco_qy,
-            "Acoes_Emitidas_QY": acoes_qy,
-            "Dividendos_QY": divid_qy,
-            "JCP_QY": jcp_qy,
-        })
-        .reset_index()
-    )
+    cols = {"preco": col_preco, "acoes": col_acoes, "div": col_div, "jcp": col_jcp}
+    out = (agg or _aggregate_qy)(df, cols)
     out["DPS_QY"] = (out["Dividendos_QY"].fillna(0.0) + out["JCP_QY"].fillna(0.0)) / out["Acoes_Emitidas_QY"]
     out.loc[~np.isfinite(out["DPS_QY"]), "DPS_QY"] = np.nan
     out["DY_QY"] = out["DPS_QY"] / out["Preco_QY"]
     return out
 
-@st.cache_data(show_spinner=False)  
-def load_base_full(path: str = "src/base_para_simulador_indicadores_refatorado.csv") -> pd.DataFrame:
-    df = pd.read_csv(path)
-    # garante tipos básicos
-    if "Data_Referencia" in df.columns:
-        df["Data_Referencia"] = pd.to_datetime(df["Data_Referencia"], errors="coerce")
-        df = df[df["Data_Referencia"] < "2025-05-01"]  # filtra datas inválidas
-    # garante FY/FQ se não existirem
-    if "FY" not in df.columns and "Data_Referencia" in df.columns:
-        df["FY"] = df["Data_Referencia"].dt.year
-    if "FQ" not in df.columns and "Data_Referencia" in df.columns:
-        # converte mês → trimestre
-        df["FQ"] = (((df["Data_Referencia"].dt.month - 1) // 3) + 1).astype("Int64")
-    # normaliza ticker
-    if "Ticker" in df.columns:
-        df["Ticker"] = df["Ticker"].astype(str).str.strip().str.upper()
-    return df
+
+def _aggregate_qy(df: pd.DataFrame, cols: dict) -> pd.DataFrame:
+    """
+    Agrega a base por (Ticker, FY, FQ) com reduções nativas do groupby.
+    cols: nomes resolvidos das colunas {"preco", "acoes", "div", "jcp"} (None = ausente).
+    """
+    usados = [c for c in cols.values() if c is not None]
+    df = df.sort_values(["Ticker", "Data_Referencia"])
+    df[usados] = df[usados].apply(pd.to_numeric, errors="coerce")  # coerção uma vez, fora dos grupos
+    gb = df.groupby(["Ticker", "FY", "FQ"], observed=True)
+
+    preco_qy = gb[cols["preco"]].mean()                              # média do preço no trimestre
+    acoes_qy = gb[cols["acoes"]].last() if cols["acoes"] else pd.Series(np.nan, index=preco_qy.index)  # último não nulo
+    divid_qy = gb[cols["div"]].sum(min_count=1) if cols["div"] else pd.Series(0.0, index=preco_qy.index)
+    jcp_qy   = gb[cols["jcp"]].sum(min_count=1) if cols["jcp"] else pd.Series(0.0, index=preco_qy.index)
+
+    return pd.DataFrame({
+        "Preco_QY": preco_qy,
+        "Acoes_Emitidas_QY": acoes_qy,
+        "Dividendos_QY": divid_qy,
+        "JCP_QY": jcp_qy,
+    }).reset_index()
+
+
+def load_base_full(path: str = catalog.BASE_FULL) -> pd.DataFrame:
+    # frame compartilhado do catálogo (somente leitura)
+    return catalog.get_source(path)
 
 
 def _pick_first(df: pd.DataFrame, cols: list[str], default=np.nan):
@@ -190,14 +200,6 @@ def _pick_first(df: pd.DataFrame, cols: list[str], default=np.nan):
             return df[c]
     return pd.Series(default, index=df.index if len(df.index) else pd.RangeIndex(0))
 
-def _ensure_sim_history():
-    if "sim_history" not in st.session_state:
-        try:
-            dfh = pd.read_csv(HISTORY_FILE)
-            st.session_state["sim_history"] = dfh.to_dict(orient="records")
-        except Exception:
-            st.session_state["sim_history"] = []
-
 def _portfolio_signature(portfolio: dict) -> str:
     items = []
     for t, d in sorted(portfolio.items(), key=lambda x: str(x[0]).upper()):
@@ -207,20 +209,10 @@ def _portfolio_signature(portfolio: dict) -> str:
     return "|".join(items)
 
 def _append_or_update_history(row: dict):
-    _ensure_sim_history()
-    # dedupe por run_key (mesma composição + mesmo período base e fim)
-    found = False
-    for i, r in enumerate(st.session_state["sim_history"]):
-        if r.get("run_key") == row.get("run_key"):
-            st.session_state["sim_history"][i] = row
-            found = True
-            break
-    if not found:
-        st.session_state["sim_history"].append(row)
-    # persiste em CSV leve (sem objetos grandes)
+    # dedupe por run_key (mesma composição + mesmo período base e fim);
+    # o store só grava quando o conteúdo muda
     try:
-        dfh = pd.DataFrame(st.session_state["sim_history"])
-        dfh.to_csv(HISTORY_FILE, index=False, encoding="utf-8-sig")
+        history_store.upsert_run(row)
     except Exception:
         pass
 
@@ -229,7 +221,6 @@ def save_simulation_run(portfolio: dict,
                         timeline: pd.DataFrame,
                         kpis: dict,
                         vol_anual: float, hit_ratio: float, max_dd: float):
-    _ensure_sim_history()
     if timeline is None or timeline.empty or not portfolio:
         return
     end_ano = int(timeline["Ano"].iloc[-1])
@@ -267,97 +258,735 @@ def save_simulation_run(portfolio: dict,
     }
     _append_or_update_history(row)
 
-def _save_sim_history_to_disk():
-    try:
-        if "sim_history" in st.session_state and st.session_state["sim_history"]:
-            pd.DataFrame(st.session_state["sim_history"]).to_csv(HISTORY_FILE, index=False, encoding="utf-8-sig")
-    except Exception:
-        pass
-
-
 def log_simulation(record: dict):
-    """Chame isso ao final da simulação (Página 2) para gravar na sessão + CSV."""
-    st.session_state.setdefault("sim_history", [])
-    st.session_state["sim_history"].append(record)
-    _save_sim_history_to_disk()
+    """Chame isso ao final da simulação (Página 2) para gravar no histórico persistente."""
+    record = dict(record)
+    record.setdefault("run_key", str(record.get("sim_id", "")))
+    _append_or_update_history(record)
     
+def _qkey_to_period(qkeys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Decodifica qkey (= FY*4 + FQ) em (ano, trimestre)."""
+    qkeys = np.asarray(qkeys, dtype="int64")
+    return (qkeys - 1) // 4, (qkeys - 1) % 4 + 1
+
+def build_qy_matrices(df_qy: pd.DataFrame) -> dict:
+    """
+    Converte o painel trimestral (saída de build_qy_panel) em matrizes densas
+    Ticker × Trimestre. Linhas seguem `tickers` (ordenado) e colunas seguem
+    `qkeys` (ordenado); células sem dado (ou não finitas) ficam NaN.
+    O resultado é compartilhado e deve ser tratado como somente leitura.
+
+    Memoizado pela identidade do frame (o painel do catálogo é um objeto único por
+    versão da base), sem hashear o conteúdo a cada chamada como o st.cache_* faria.
+    """
+    with _MATS_LOCK:
+        hit = _MATS_BY_FRAME.get(id(df_qy))
+        if hit is not None and hit[0]() is df_qy:
+            return hit[1]
+    mats = _build_qy_matrices(df_qy)
+    with _MATS_LOCK:
+        for k in [k for k, (ref, _) in _MATS_BY_FRAME.items() if ref() is None]:
+            del _MATS_BY_FRAME[k]  # frames já coletados
+        _MATS_BY_FRAME[id(df_qy)] = (weakref.ref(df_qy), mats)
+    return mats
+
+
+def clear_matrices_cache():
+    """Esquece as matrizes memoizadas por build_qy_matrices."""
+    with _MATS_LOCK:
+        _MATS_BY_FRAME.clear()
+
+
+def _build_qy_matrices(df_qy: pd.DataFrame) -> dict:
+    tickers = df_qy["Ticker"].astype(str).str.strip().str.upper()
+    fy = pd.to_numeric(df_qy["FY"], errors="coerce")
+    fq = pd.to_numeric(df_qy["FQ"], errors="coerce")
+    ok = (fy.notna() & fq.notna()).to_numpy()
+
+    qkey = (fy[ok] * 4 + fq[ok]).astype("int64").to_numpy()
+    tk_codes, tk_uni = pd.factorize(tickers[ok], sort=True)
+    qkeys = np.unique(qkey)
+    q_codes = np.searchsorted(qkeys, qkey)
+
+    def _dense(col):
+        m = np.full((len(tk_uni), len(qkeys)), np.nan)
+        if col in df_qy.columns:
+            v = pd.to_numeric(df_qy.loc[ok, col], errors="coerce").to_numpy(dtype="float64")
+            m[tk_codes, q_codes] = np.where(np.isfinite(v), v, np.nan)
+        return m
+
+    mats = {
+        "tickers": np.asarray(tk_uni, dtype=object),
+        "qkeys": qkeys,
+        "preco": _dense("Preco_QY"),
+        "acoes": _dense("Acoes_Emitidas_QY"),
+        "dps": _dense("DPS_QY"),
+        "dy": _dense("DY_QY"),
+    }
+    mats["fingerprint"] = _matrices_fingerprint(mats)
+    return _index_matrices(mats)
+
+
+def _index_matrices(mats: dict) -> dict:
+    """Completa o dict de matrizes com os índices derivados (posição do ticker, ano/trimestre)."""
+    mats["tk_pos"] = {t: i for i, t in enumerate(mats["tickers"])}
+    mats["anos"], mats["tris"] = _qkey_to_period(mats["qkeys"])
+    return mats
+
+
+def load_qy_matrices(path_csv: str) -> dict:
+    """
+    Matrizes do painel trimestral direto dos .npy mapeados em memória (panel_store),
+    compartilhados entre processos. Só na primeira vez para cada versão da base o painel
+    é agregado e as matrizes gravadas; depois nenhum worker precisa ler o CSV.
+    """
+    return _load_qy_matrices(path_csv, catalog.dataset_version(path_csv))
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _load_qy_matrices(path_csv: str, version: str) -> dict:
+    mats = panel_store.open_matrices(path_csv, version)
+    if mats is None:
+        panel_store.write_matrices(path_csv, version, build_qy_matrices(build_qy_panel(path_csv)))
+        mats = panel_store.open_matrices(path_csv, version)
+        if mats is None:  # sem permissão de escrita: fica com as matrizes em memória
+            return build_qy_matrices(build_qy_panel(path_csv))
+    return _index_matrices(mats)
+
+
+def _as_matrices(df_qy) -> dict:
+    """Aceita o painel (DataFrame) ou matrizes já prontas (build_qy_matrices / load_qy_matrices)."""
+    return df_qy if isinstance(df_qy, dict) else build_qy_matrices(df_qy)
+
+
+def base_prices(df_qy, base_year: int, base_quarter: int) -> dict:
+    """Preço médio (Preco_QY) de cada ticker no trimestre-base, só valores válidos."""
+    mats = _as_matrices(df_qy)
+    col = _base_column(mats, base_year, base_quarter)
+    if col is None:
+        return {}
+    p = mats["preco"][:, col]
+    ok = np.isfinite(p)
+    return dict(zip(mats["tickers"][ok], p[ok].tolist()))
+
+def _matrices_fingerprint(mats: dict) -> str:
+    """Impressão digital do conteúdo do painel (muda se qualquer preço/DPS mudar)."""
+    h = hashlib.sha1()
+    h.update("|".join(mats["tickers"]).encode("utf-8"))
+    for k in ("qkeys", "preco", "dps"):
+        h.update(np.ascontiguousarray(mats[k]).tobytes())
+    return h.hexdigest()[:16]
+
+def _base_column(mats: dict, base_year: int, base_quarter: int):
+    """Posição da coluna do trimestre-base nas matrizes (ou None se não existir)."""
+    base_key = int(base_year) * 4 + int(base_quarter)
+    bpos = int(np.searchsorted(mats["qkeys"], base_key))
+    if bpos < len(mats["qkeys"]) and mats["qkeys"][bpos] == base_key:
+        return bpos
+    return None
+
+ATTRIBUTION_COLS = ["Ticker", "Qtd", "Preco_Base", "Valor_Inicial", "Valor_Final", "Dividendos",
+                    "Delta_Preco", "Ganho_Total", "Retorno", "Peso_Final"]
+
+
 def simulate_historical_quarterly(portfolio: dict, df_qy: pd.DataFrame, base_year: int, base_quarter: int):
-    if not portfolio:
-        kpis = {"valor_inicial": 0.0, "valor_final": 0.0, "div_acum": 0.0, "ret_total": np.nan, "cagr": np.nan}
-        return pd.DataFrame(), kpis, [], pd.DataFrame()
+    """
+    Simulação buy & hold trimestral a partir do trimestre-base (FY/FQ).
+    Motor matricial: fatia as matrizes Ticker × Trimestre do painel e calcula
+    timeline, KPIs e detalhe por ticker com operações vetorizadas.
 
-    df_qy = df_qy.copy()
-    df_qy["Ticker"] = df_qy["Ticker"].astype(str).str.strip().str.upper()
-    portfolio = {str(k).strip().upper(): v for k, v in portfolio.items()}
-    base_year, base_quarter = int(base_year), int(base_quarter)
+    df_qy: painel trimestral (DataFrame) ou matrizes já prontas (load_qy_matrices);
+    vale também para simulate_batch_quarterly, simulate_entry_sweep e run_simulation_cached.
 
-    base = df_qy[(df_qy["FY"] == base_year) & (df_qy["FQ"] == base_quarter)][["Ticker", "Preco_QY"]].dropna()
-    base_prices = dict(zip(base["Ticker"], base["Preco_QY"]))
+    Retorna (timeline, kpis, excluidos, details) — mesmo contrato do laço original
+    (referência em bench/bench_simulacao.py).
+    """
+    return _simulate_quarterly(portfolio, df_qy, base_year, base_quarter)[:4]
 
-    excluidos, valid = [], {}
-    for tck, d in portfolio.items():
-        if tck in base_prices and np.isfinite(base_prices[tck]):
-            valid[tck] = {"qtd": int(d.get("quantidade", 0)), "preco_base": float(base_prices[tck])}
-        else:
-            excluidos.append(tck)
-    if not valid:
-        kpis = {"valor_inicial": 0.0, "valor_final": 0.0, "div_acum": 0.0, "ret_total": np.nan, "cagr": np.nan}
-        return pd.DataFrame(), kpis, excluidos, pd.DataFrame()
-
-    valor_inicial = sum(v["qtd"] * v["preco_base"] for v in valid.values())
-
-    base_key = base_year * 4 + base_quarter
-    df_qy["qkey"] = df_qy["FY"] * 4 + df_qy["FQ"]
-    qkeys = sorted(df_qy.loc[df_qy["qkey"] > base_key, "qkey"].dropna().unique().tolist())
-    fy_idx = df_qy.set_index(["Ticker", "FY", "FQ"])
-
-    timeline, details_rows = [], []
-    div_acum = 0.0
-    valor_final = valor_inicial
-
-    for qk in qkeys:
-        ano = qk // 4
-        tri = qk % 4
-        if tri == 0:
-            ano -= 1
-            tri = 4
-
-        valor_trim = 0.0
-        div_trim = 0.0
-
-        for tck, v in valid.items():
-            preco = np.nan
-            dps = 0.0
-            if (tck, ano, tri) in fy_idx.index:
-                row = fy_idx.loc[(tck, ano, tri)]
-                preco = float(row.get("Preco_QY")) if np.isfinite(row.get("Preco_QY")) else np.nan
-                dps   = float(row.get("DPS_QY"))   if np.isfinite(row.get("DPS_QY"))   else 0.0
-
-            qtd = v["qtd"]
-            valor_ticker = (qtd * preco) if np.isfinite(preco) else np.nan
-            div_ticker   = qtd * dps
-            if np.isfinite(valor_ticker):
-                valor_trim += valor_ticker
-            div_trim += div_ticker
-
-            details_rows.append({
-                "Ano": int(ano), "Trimestre": int(tri), "Ticker": tck,
-                "Valor_Ticker": valor_ticker, "Dividendos_Ticker": div_ticker
-            })
-
-        div_acum += div_trim
-        valor_final = valor_trim if np.isfinite(valor_trim) else valor_final
-        timeline.append({"Ano": int(ano), "Trimestre": int(tri), "Valor_Sem_Dividendos": valor_trim, "Dividendos_Trimestre": div_trim})
-
-    n_quarters = len(qkeys)
+
+def _quarter_end(anos, tris) -> pd.DatetimeIndex:
+    """Fim do trimestre (mesmo Periodo usado nos gráficos da Simulação)."""
+    inicio = pd.to_datetime(pd.DataFrame({"year": np.asarray(anos, dtype="int64"),
+                                          "month": np.asarray(tris, dtype="int64") * 3, "day": 1}))
+    return pd.DatetimeIndex(inicio.dt.to_period("Q").dt.to_timestamp(how="end"), name="Periodo")
+
+
+def _ticker_returns(tickers: np.ndarray, periodo: pd.DatetimeIndex,
+                    valor_tck: np.ndarray, div_tck: np.ndarray) -> tuple:
+    """
+    Retornos trimestrais por ticker em formato largo (Periodo × Ticker):
+    (valor + dividendos do trimestre) / valor do trimestre anterior - 1; o 1º trimestre fica NaN.
+    Junto, o resumo de risco por coluna: retorno composto, vol anualizada (desvio-padrão
+    populacional × 2), último valor válido e peso final.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.full(valor_tck.shape, np.nan)
+        r[:, 1:] = (valor_tck[:, 1:] + div_tck[:, 1:]) / valor_tck[:, :-1] - 1.0
+    returns = pd.DataFrame(r.T, index=periodo, columns=pd.Index(tickers, name="Ticker"))
+
+    ok = np.isfinite(r)
+    n = ok.sum(axis=1)
+    ret_total = np.where(n > 0, np.prod(np.where(ok, 1.0 + r, 1.0), axis=1) - 1.0, np.nan)
+    media = np.where(ok, r, 0.0).sum(axis=1) / np.maximum(n, 1)
+    var = np.where(ok, (r - media[:, None]) ** 2, 0.0).sum(axis=1) / np.maximum(n, 1)
+    vol = np.where(n > 1, np.sqrt(var) * np.sqrt(4), np.nan)
+    valor_final = _last_valid(valor_tck)
+    tot = np.nansum(valor_final)
+    risk = pd.DataFrame({
+        "Ticker": tickers, "ret_total_ticker": ret_total, "vol_ticker": vol, "valor_final": valor_final,
+        "peso_final": valor_final / tot if tot > 0 else np.full(len(tickers), np.nan),
+    }).sort_values("Ticker").reset_index(drop=True)
+    return returns, risk
+
+
+def _last_valid(m: np.ndarray) -> np.ndarray:
+    """Último valor finito de cada linha (NaN se a linha não tem nenhum)."""
+    fin = np.isfinite(m)
+    ult = m.shape[1] - 1 - np.argmax(fin[:, ::-1], axis=1)
+    return np.where(fin.any(axis=1), m[np.arange(m.shape[0]), ult], np.nan)
+
+
+def _attribution(tickers: np.ndarray, qtd: np.ndarray, preco_base: np.ndarray,
+                 valor_tck: np.ndarray, div_tck: np.ndarray) -> pd.DataFrame:
+    """
+    Atribuição por ticker (uma linha por ticker com qtd > 0), direto das matrizes do motor:
+    valor inicial, último valor válido no período, dividendos somados, Δ preço,
+    ganho, retorno (fração) e peso no valor final. Valor_Final NaN = sem preço no período.
+    """
+    ok = qtd > 0
+    valor_tck, div_tck = valor_tck[ok], div_tck[ok]
+    vi = qtd[ok] * preco_base[ok]
+    vf = _last_valid(valor_tck)
+    div = div_tck.sum(axis=1)
+    ganho = vf + div - vi
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.where(vi > 0, ganho / vi, np.nan)
+    tot = np.nansum(vf)
+    return pd.DataFrame({
+        "Ticker": tickers[ok], "Qtd": qtd[ok].astype("int64"), "Preco_Base": preco_base[ok],
+        "Valor_Inicial": vi, "Valor_Final": vf, "Dividendos": div,
+        "Delta_Preco": vf - vi, "Ganho_Total": ganho, "Retorno": ret,
+        "Peso_Final": vf / tot if tot > 0 else np.full(len(vi), np.nan),
+    }, columns=ATTRIBUTION_COLS)
+
+
+def _kpis_from_totals(valor_inicial: float, valor_trim: np.ndarray, div_trim: np.ndarray) -> dict:
+    """KPIs da simulação a partir dos totais trimestrais (valor sem dividendos e dividendos)."""
+    n_quarters = len(valor_trim)
+    div_acum = float(div_trim.sum())
+    valor_final = float(valor_trim[-1])
     ret_total = ((valor_final + div_acum - valor_inicial) / valor_inicial) if valor_inicial > 0 else np.nan
-    cagr = (((valor_final + div_acum) / valor_inicial) ** (4 / n_quarters) - 1) if (valor_inicial > 0 and n_quarters > 0) else np.nan
-    kpis = {"valor_inicial": float(valor_inicial), "valor_final": float(valor_final), "div_acum": float(div_acum),
+    cagr = (((valor_final + div_acum) / valor_inicial) ** (4 / n_quarters) - 1) if valor_inicial > 0 else np.nan
+    return {"valor_inicial": valor_inicial, "valor_final": valor_final, "div_acum": div_acum,
             "ret_total": float(ret_total) if np.isfinite(ret_total) else np.nan,
             "cagr": float(cagr) if np.isfinite(cagr) else np.nan}
 
-    details = pd.DataFrame(details_rows)
-    return pd.DataFrame(timeline), kpis, excluidos, details
+
+def _simulate_quarterly(portfolio: dict, df_qy, base_year: int, base_quarter: int) -> tuple:
+    """
+    Núcleo de simulate_historical_quarterly. O 5º item reúne as tabelas por ticker:
+    "attribution" (_attribution), "returns" e "ticker_risk" (_ticker_returns).
+    """
+    kpis_vazio = {"valor_inicial": 0.0, "valor_final": 0.0, "div_acum": 0.0, "ret_total": np.nan, "cagr": np.nan}
+    if not portfolio:
+        return pd.DataFrame(), kpis_vazio, [], pd.DataFrame(), _por_ticker_vazio()
+
+    mats = _as_matrices(df_qy)
+    bpos = _base_column(mats, base_year, base_quarter)
+    excluidos, rows, qtd = _portfolio_rows(mats, _quantities(portfolio), bpos)
+    if not len(rows):
+        return pd.DataFrame(), kpis_vazio, excluidos, pd.DataFrame(), _por_ticker_vazio()
+
+    valor_inicial, valor_trim, div_trim = _portfolio_totals(mats, rows, qtd, bpos)
+    if len(valor_trim) == 0:
+        kpis = dict(kpis_vazio, valor_inicial=valor_inicial, valor_final=valor_inicial,
+                    ret_total=0.0 if valor_inicial > 0 else np.nan)
+        return pd.DataFrame(), kpis, excluidos, pd.DataFrame(), _por_ticker_vazio()
+
+    timeline = pd.DataFrame({
+        "Ano": mats["anos"][bpos + 1:], "Trimestre": mats["tris"][bpos + 1:],
+        "Valor_Sem_Dividendos": valor_trim, "Dividendos_Trimestre": div_trim,
+    })
+    details, por_ticker = _ticker_tables(mats, rows, qtd, bpos)
+    return timeline, _kpis_from_totals(valor_inicial, valor_trim, div_trim), excluidos, details, por_ticker
+
+
+def _por_ticker_vazio() -> dict:
+    return {"attribution": pd.DataFrame(columns=ATTRIBUTION_COLS),
+            "returns": pd.DataFrame(), "ticker_risk": pd.DataFrame()}
+
+
+def _portfolio_rows(mats: dict, quantidades: dict, bpos) -> tuple:
+    """(excluidos, linhas, qtd) na ordem da carteira; excluído = sem preço válido no trimestre-base."""
+    excluidos, rows, qtds = [], [], []
+    for tck, q in quantidades.items():
+        i = mats["tk_pos"].get(tck)
+        preco_base = mats["preco"][i, bpos] if (i is not None and bpos is not None) else np.nan
+        if np.isfinite(preco_base):
+            rows.append(i)
+            qtds.append(q)
+        else:
+            excluidos.append(tck)
+    return excluidos, np.asarray(rows, dtype="int64"), np.asarray(qtds, dtype="float64")
+
+
+def _portfolio_totals(mats: dict, rows: np.ndarray, qtd: np.ndarray, bpos: int) -> tuple:
+    """(valor_inicial, valor por trimestre sem dividendos, dividendos por trimestre) após o base."""
+    valor_tck = qtd[:, None] * mats["preco"][rows, bpos + 1:]
+    dps = mats["dps"][rows, bpos + 1:]
+    valor_trim = np.where(np.isfinite(valor_tck), valor_tck, 0.0).sum(axis=0)
+    div_trim = (qtd[:, None] * np.where(np.isfinite(dps), dps, 0.0)).sum(axis=0)
+    return float(np.dot(qtd, mats["preco"][rows, bpos])), valor_trim, div_trim
+
+
+def _ticker_tables(mats: dict, rows: np.ndarray, qtd: np.ndarray, bpos: int) -> tuple:
+    """(details, por_ticker): detalhe longo por ticker × trimestre e atribuição / retornos / risco."""
+    preco = mats["preco"][rows, bpos + 1:]
+    dps = mats["dps"][rows, bpos + 1:]
+    n_quarters = preco.shape[1]
+    valor_tck = qtd[:, None] * preco                                  # NaN onde não há preço
+    div_tck = qtd[:, None] * np.where(np.isfinite(dps), dps, 0.0)
+    anos = mats["anos"][bpos + 1:]
+    tris = mats["tris"][bpos + 1:]
+    tickers = mats["tickers"][rows]
+
+    # detalhe em formato longo: trimestre-major, tickers na ordem da carteira
+    k = len(rows)
+    details = pd.DataFrame({
+        "Ano": np.repeat(anos, k), "Trimestre": np.repeat(tris, k),
+        "Ticker": np.tile(tickers, n_quarters),
+        "Valor_Ticker": valor_tck.T.ravel(), "Dividendos_Ticker": div_tck.T.ravel(),
+    })
+    returns, risk = _ticker_returns(tickers, _quarter_end(anos, tris), valor_tck, div_tck)
+    por_ticker = {
+        "attribution": _attribution(tickers, qtd, mats["preco"][rows, bpos], valor_tck, div_tck),
+        "returns": returns,
+        "ticker_risk": risk,
+    }
+    return details, por_ticker
+
+def simulate_batch_quarterly(qty: np.ndarray, tickers: list, df_qy: pd.DataFrame,
+                             base_year: int, base_quarter: int) -> dict:
+    """
+    Simula várias carteiras de uma vez sobre o mesmo trimestre-base.
+
+    qty: matriz (n_carteiras × n_tickers) de quantidades; coluna j ↔ tickers[j].
+    O painel é preparado uma única vez (build_qy_matrices) e cada carteira
+    vira uma linha de um produto matricial quantidades × preços/DPS.
+
+    Retorna dict com:
+      - "tickers", "excluidos" (sem preço no trimestre-base; contribuem 0)
+      - "anos", "trimestres" (trimestres posteriores ao base)
+      - "valor", "dividendos": matrizes (n_carteiras × n_trimestres), a timeline de cada carteira
+      - "valor_inicial", "valor_final", "div_acum", "ret_total", "cagr": vetores (n_carteiras,)
+    Mesma semântica de simulate_historical_quarterly, linha a linha.
+    """
+    qty = np.atleast_2d(np.asarray(qty, dtype="float64"))
+    tickers = [str(t).strip().upper() for t in tickers]
+    if qty.shape[1] != len(tickers):
+        raise ValueError("qty deve ter uma coluna por ticker.")
+
+    mats = _as_matrices(df_qy)
+    bpos = _base_column(mats, base_year, base_quarter)
+
+    rows = np.array([mats["tk_pos"].get(t, -1) for t in tickers], dtype="int64")
+    preco_base = np.full(len(tickers), np.nan)
+    if bpos is not None:
+        tem = rows >= 0
+        preco_base[tem] = mats["preco"][rows[tem], bpos]
+    valid = np.isfinite(preco_base)
+    excluidos = [t for t, v in zip(tickers, valid) if not v]
+
+    n_port = qty.shape[0]
+    q = qty[:, valid]
+    r = rows[valid]
+    ini = (bpos + 1) if valid.any() else len(mats["qkeys"])
+
+    preco = mats["preco"][r, ini:]
+    dps = mats["dps"][r, ini:]
+    n_quarters = preco.shape[1]
+
+    valor_inicial = q @ preco_base[valid]
+    valor = q @ np.where(np.isfinite(preco), preco, 0.0)
+    dividendos = q @ np.where(np.isfinite(dps), dps, 0.0)
+    div_acum = dividendos.sum(axis=1)
+    valor_final = valor[:, -1] if n_quarters > 0 else valor_inicial.copy()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pos = valor_inicial > 0
+        ret_total = np.where(pos, (valor_final + div_acum - valor_inicial) / valor_inicial, np.nan)
+        if n_quarters > 0:
+            cagr = np.where(pos, ((valor_final + div_acum) / valor_inicial) ** (4 / n_quarters) - 1, np.nan)
+        else:
+            cagr = np.full(n_port, np.nan)
+
+    return {
+        "tickers": tickers,
+        "excluidos": excluidos,
+        "anos": mats["anos"][ini:],
+        "trimestres": mats["tris"][ini:],
+        "valor": valor,
+        "dividendos": dividendos,
+        "valor_inicial": valor_inicial,
+        "valor_final": valor_final,
+        "div_acum": div_acum,
+        "ret_total": ret_total,
+        "cagr": cagr,
+    }
+
+def simulate_entry_sweep(portfolio: dict, df_qy: pd.DataFrame) -> dict:
+    """
+    Simula a carteira para TODOS os pares (trimestre-base b, trimestre-fim e > b)
+    de uma vez só, sem rodar uma simulação por data-base.
+
+    Com W = qtd × preço (ticker × trimestre) e M = máscara de preço válido,
+    o valor da carteira comprada em b e avaliada em e é (Mᵀ W)[b, e]; os
+    dividendos usam somas acumuladas (Mᵀ cumsum(qtd × DPS)) e o drawdown usa
+    máximos/mínimos acumulados por linha.
+
+    Retorna dict com "anos", "trimestres" (eixo comum a base e fim) e matrizes
+    (n_trimestres × n_trimestres) "ret_total", "cagr", "max_dd", "div_acum",
+    "valor_inicial" (vetor); pares inválidos (e <= b ou sem valor inicial) ficam NaN.
+    """
+    mats = _as_matrices(df_qy)
+    n_q = len(mats["qkeys"])
+    vazio = np.full((n_q, n_q), np.nan)
+    out = {"anos": mats["anos"], "trimestres": mats["tris"], "valor_inicial": np.full(n_q, np.nan),
+           "ret_total": vazio, "cagr": vazio.copy(), "max_dd": vazio.copy(), "div_acum": vazio.copy()}
+
+    portfolio = {str(k).strip().upper(): v for k, v in portfolio.items()}
+    pares = [(mats["tk_pos"][t], int(d.get("quantidade", 0))) for t, d in portfolio.items() if t in mats["tk_pos"]]
+    if not pares or n_q == 0:
+        return out
+
+    rows = np.array([r for r, _ in pares], dtype="int64")
+    qtd = np.array([q for _, q in pares], dtype="float64")[:, None]
+    preco = mats["preco"][rows]
+    dps = mats["dps"][rows]
+
+    valido = np.isfinite(preco).astype("float64")                       # M: entra na base b?
+    W = qtd * np.where(np.isfinite(preco), preco, 0.0)
+    C = np.cumsum(qtd * np.where(np.isfinite(dps), dps, 0.0), axis=1)
+
+    V = valido.T @ W                                                    # V[b, e]
+    Dc = valido.T @ C
+    v0 = np.diag(V).copy()
+    div = Dc - np.diag(Dc)[:, None]
+
+    b_idx, e_idx = np.indices((n_q, n_q))
+    n = (e_idx - b_idx).astype("float64")
+    par_ok = (e_idx > b_idx) & (v0[:, None] > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.where(par_ok, (V + div - v0[:, None]) / v0[:, None], np.nan)
+        cagr = np.where(par_ok, ((V + div) / v0[:, None]) ** (4 / np.where(n > 0, n, 1)) - 1, np.nan)
+
+        # drawdown sobre o valor sem dividendos, apenas trimestres após a base
+        v_pos = np.where(e_idx > b_idx, V, np.nan)
+        pico = np.fmax.accumulate(v_pos, axis=1)
+        dd = v_pos / pico - 1.0
+        max_dd = np.where(par_ok, np.fmin.accumulate(dd, axis=1), np.nan)
+
+    out.update({
+        "valor_inicial": np.where(v0 > 0, v0, np.nan),
+        "ret_total": ret,
+        "cagr": cagr,
+        "max_dd": max_dd,
+        "div_acum": np.where(par_ok, div, np.nan),
+    })
+    return out
+
+def entry_sweep_long(sweep: dict) -> pd.DataFrame:
+    """Achata o resultado de simulate_entry_sweep em formato longo (um par base × fim por linha)."""
+    rotulos = np.array([f"{a}T{t}" for a, t in zip(sweep["anos"], sweep["trimestres"])], dtype=object)
+    b_idx, e_idx = np.nonzero(np.isfinite(sweep["ret_total"]))
+    return pd.DataFrame({
+        "Base": rotulos[b_idx],
+        "Fim": rotulos[e_idx],
+        "ret_total": sweep["ret_total"][b_idx, e_idx],
+        "cagr": sweep["cagr"][b_idx, e_idx],
+        "max_dd": sweep["max_dd"][b_idx, e_idx],
+        "div_acum": sweep["div_acum"][b_idx, e_idx],
+    })
+
+_SIM_CACHE = OrderedDict()      # chave -> (resultado, bytes estimados)
+_SIM_CACHE_LOCK = threading.Lock()
+_SIM_CACHE_BYTES = 0
+
+def _result_nbytes(v) -> int:
+    """Bytes estimados de um resultado (tabelas/arrays, inclusive dentro de dicts e tuplas)."""
+    if isinstance(v, (pd.DataFrame, pd.Series)):
+        return int(v.memory_usage(index=True, deep=True).sum())
+    if isinstance(v, np.ndarray):
+        return v.nbytes
+    if isinstance(v, dict):
+        return sum(_result_nbytes(x) for x in v.values())
+    if isinstance(v, (list, tuple)):
+        return sum(_result_nbytes(x) for x in v)
+    return 0
+
+def _sim_cache_evict():
+    """Despeja os menos usados até caber nos limites (mantém ao menos o mais recente). Chamar com o lock."""
+    global _SIM_CACHE_BYTES
+    while len(_SIM_CACHE) > 1 and (len(_SIM_CACHE) > SIM_CACHE_MAX_ENTRIES or _SIM_CACHE_BYTES > SIM_CACHE_MAX_BYTES):
+        _, (_, nb) = _SIM_CACHE.popitem(last=False)
+        _SIM_CACHE_BYTES -= nb
+
+def _sim_cache_put(key: str, res: dict):
+    global _SIM_CACHE_BYTES
+    nbytes = _result_nbytes(res)
+    with _SIM_CACHE_LOCK:
+        if key in _SIM_CACHE:
+            _SIM_CACHE_BYTES -= _SIM_CACHE.pop(key)[1]
+        _SIM_CACHE[key] = (res, nbytes)
+        _SIM_CACHE_BYTES += nbytes
+        _sim_cache_evict()
+
+def _sim_cache_get(key: str):
+    with _SIM_CACHE_LOCK:
+        hit = _SIM_CACHE.get(key)
+        if hit is None:
+            return None
+        _SIM_CACHE.move_to_end(key)
+        return hit[0]
+
+def clear_simulation_cache():
+    global _SIM_CACHE_BYTES
+    with _SIM_CACHE_LOCK:
+        _SIM_CACHE.clear()
+        _SIM_CACHE_BYTES = 0
+
+def run_simulation_cached(portfolio: dict, df_qy: pd.DataFrame, base_year: int, base_quarter: int,
+                          estado: dict = None) -> dict:
+    """
+    Simulação + métricas derivadas, com cache LRU por processo.
+    Chave = período-base + _portfolio_signature + impressão digital do painel,
+    então reruns do Streamlit com a mesma carteira/base são acertos de cache.
+
+    Retorna dict: timeline, kpis, excluidos, tl (timeline preparada), tl_metrics,
+    vol_anual, hit_ratio, max_dd. As tabelas por ticker (details, attribution, returns,
+    ticker_risk) só são montadas quando pedidas, via ticker_tables(res).
+    Tratar como somente leitura.
+
+    estado: portfolio_state já sincronizado com `portfolio` (sync_portfolio_state); num miss
+    a timeline e os KPIs saem dos totais dele, sem montar as tabelas por ticker. Antes disso
+    os totais são recalculados das matrizes (state_rebase), então o resultado em cache não
+    depende da sequência de edições que levou o estado até a carteira.
+    """
+    mats = _as_matrices(df_qy)
+    key = f"{int(base_year)}T{int(base_quarter)}|{_portfolio_signature(portfolio)}|{mats['fingerprint']}"
+    res = _sim_cache_get(key)
+    if res is not None:
+        return res
+
+    quantidades = _quantities(portfolio)
+    if estado is None or estado["chave"] != _state_key(mats, base_year, base_quarter) \
+            or estado["carteira"] != quantidades:
+        estado = portfolio_state(portfolio, mats, base_year, base_quarter)
+    else:
+        state_rebase(estado)
+    # cópias: o estado segue mutável (what-if, próximas edições)
+    timeline, kpis, excluidos = state_timeline(dict(estado, valor=estado["valor"].copy(), div=estado["div"].copy()))
+
+    bpos = _base_column(mats, base_year, base_quarter)
+
+    def _por_ticker():
+        _, rows, qtd = _portfolio_rows(mats, quantidades, bpos)
+        if timeline.empty or not len(rows):
+            return dict(_por_ticker_vazio(), details=pd.DataFrame())
+        details, por_ticker = _ticker_tables(mats, rows, qtd, bpos)
+        return dict(por_ticker, details=details)
+
+    res = {"_key": key, "_por_ticker": _por_ticker,
+           "timeline": timeline, "kpis": kpis, "excluidos": excluidos,
+           "tl": None, "tl_metrics": None, "vol_anual": np.nan, "hit_ratio": np.nan, "max_dd": np.nan}
+    if not timeline.empty:
+        res["tl"] = _prep_timeline_quarterly(timeline)
+        res["tl_metrics"], res["vol_anual"], res["hit_ratio"], res["max_dd"] = \
+            _prep_metrics_quarterly(timeline, kpis["valor_inicial"])
+    _sim_cache_put(key, res)
+    return res
+
+
+def ticker_tables(res: dict) -> dict:
+    """
+    Tabelas por ticker de um resultado de run_simulation_cached: details (longo, ticker ×
+    trimestre), attribution, returns, ticker_risk. Montadas na 1ª chamada e guardadas no resultado.
+    """
+    return cached_derived(res, "por_ticker", res["_por_ticker"])
+
+# ---------------------------------------------------------------------------
+# Estado incremental da carteira: o valor é linear nas quantidades
+# (Σ qᵢ·pᵢ por trimestre, idem dividendos), então editar/incluir/retirar um ticker
+# é somar Δq × vetor unitário do ticker — O(trimestres), sem re-simular a carteira.
+# ---------------------------------------------------------------------------
+
+def _quantities(portfolio: dict) -> dict:
+    return {str(k).strip().upper(): int(v.get("quantidade", 0)) for k, v in portfolio.items()}
+
+
+def _state_key(mats: dict, base_year: int, base_quarter: int) -> tuple:
+    return int(base_year), int(base_quarter), mats["fingerprint"]
+
+
+def base_units(df_qy, base_year: int, base_quarter: int) -> dict:
+    """
+    Vetores unitários (1 ação) do trimestre-base para todo o universo: preço-base e,
+    nos trimestres posteriores, valor e dividendos por ação (NaN -> 0). São fatias das
+    matrizes (sem cópia); None se o trimestre-base não existe no painel.
+    """
+    mats = _as_matrices(df_qy)
+    bpos = _base_column(mats, base_year, base_quarter)
+    if bpos is None:
+        return None
+    return {
+        "mats": mats,
+        "preco_base": mats["preco"][:, bpos],
+        "valor": mats["preco"][:, bpos + 1:],
+        "dps": mats["dps"][:, bpos + 1:],
+        "anos": mats["anos"][bpos + 1:],
+        "tris": mats["tris"][bpos + 1:],
+    }
+
+
+def _unit_row(m: np.ndarray, i: int) -> np.ndarray:
+    row = np.asarray(m[i], dtype="float64")
+    return np.where(np.isfinite(row), row, 0.0)
+
+
+def portfolio_state(portfolio: dict, df_qy, base_year: int, base_quarter: int) -> dict:
+    """
+    Estado incremental da carteira no trimestre-base: quantidades, vetores unitários
+    e totais trimestrais (valor sem dividendos, dividendos) + valor inicial.
+    Montagem completa O(tickers × trimestres); as atualizações seguintes são O(trimestres).
+    """
+    mats = _as_matrices(df_qy)
+    units = base_units(mats, base_year, base_quarter)
+    n_q = 0 if units is None else units["valor"].shape[1]
+    estado = {"chave": _state_key(mats, base_year, base_quarter), "units": units,
+              "carteira": _quantities(portfolio),
+              "valor": np.zeros(n_q), "div": np.zeros(n_q), "valor_inicial": 0.0}
+    return state_rebase(estado)
+
+
+def state_rebase(estado: dict) -> dict:
+    """
+    Recalcula os totais do estado direto das matrizes (uma redução sobre as linhas da
+    carteira, mesma conta do motor). Descarta o erro de arredondamento acumulado pelas
+    atualizações Δq, deixando os totais iguais aos de simulate_historical_quarterly.
+    """
+    units = estado["units"]
+    if units is None:
+        return estado
+    mats = units["mats"]
+    bpos = _base_column(mats, *estado["chave"][:2])
+    _, rows, qtd = _portfolio_rows(mats, estado["carteira"], bpos)
+    if len(rows):
+        estado["valor_inicial"], estado["valor"], estado["div"] = _portfolio_totals(mats, rows, qtd, bpos)
+    else:
+        estado["valor_inicial"] = 0.0
+        estado["valor"], estado["div"] = np.zeros_like(estado["valor"]), np.zeros_like(estado["div"])
+    return estado
+
+
+def _priced(estado: dict, tck: str):
+    """Linha do ticker nas matrizes se ele tem preço no trimestre-base (senão None = excluído)."""
+    units = estado["units"]
+    if units is None:
+        return None
+    i = units["mats"]["tk_pos"].get(tck)
+    if i is None or not np.isfinite(units["preco_base"][i]):
+        return None
+    return i
+
+
+def state_set_quantity(estado: dict, ticker: str, qtd) -> dict:
+    """
+    Define a quantidade de um ticker (None retira da carteira) e atualiza os totais
+    com Δq × vetores unitários — O(trimestres). Altera `estado` no lugar e o devolve.
+    """
+    tck = str(ticker).strip().upper()
+    antes = estado["carteira"].get(tck, 0)
+    if qtd is None:
+        estado["carteira"].pop(tck, None)
+        qtd = 0
+    else:
+        estado["carteira"][tck] = int(qtd)
+    delta = int(qtd) - antes
+    i = _priced(estado, tck)
+    if delta and i is not None:
+        units = estado["units"]
+        estado["valor"] += delta * _unit_row(units["valor"], i)
+        estado["div"] += delta * _unit_row(units["dps"], i)
+        estado["valor_inicial"] += delta * float(units["preco_base"][i])
+    return estado
+
+
+def sync_portfolio_state(estado: dict, portfolio: dict, df_qy, base_year: int, base_quarter: int) -> dict:
+    """
+    Leva o estado até `portfolio` aplicando só as diferenças de quantidade (edição,
+    inclusão, retirada). Recria do zero se mudou o trimestre-base ou a base, ou se
+    a maior parte da carteira mudou.
+    """
+    mats = _as_matrices(df_qy)
+    novo = _quantities(portfolio)
+    if estado is None or estado["chave"] != _state_key(mats, base_year, base_quarter):
+        return portfolio_state(portfolio, mats, base_year, base_quarter)
+    mudou = [t for t in set(novo) | set(estado["carteira"]) if novo.get(t) != estado["carteira"].get(t)]
+    if len(mudou) > max(1, len(novo) // 2):
+        return portfolio_state(portfolio, mats, base_year, base_quarter)
+    for t in mudou:
+        state_set_quantity(estado, t, novo.get(t))
+    # mantém a ordem da carteira (a mesma que o motor usa para os excluídos)
+    estado["carteira"] = {t: estado["carteira"][t] for t in novo}
+    return estado
+
+
+def state_what_if(estado: dict, ticker: str, qtd) -> dict:
+    """Cópia rasa do estado com a quantidade de `ticker` trocada (O(trimestres)); o original não muda."""
+    copia = dict(estado, carteira=dict(estado["carteira"]),
+                 valor=estado["valor"].copy(), div=estado["div"].copy())
+    return state_set_quantity(copia, ticker, qtd)
+
+
+def state_timeline(estado: dict) -> tuple:
+    """(timeline, kpis, excluidos) a partir dos totais do estado — mesmo contrato do motor, O(trimestres)."""
+    excluidos = [t for t in estado["carteira"] if _priced(estado, t) is None]
+    units = estado["units"]
+    if not len(estado["valor"]) or len(excluidos) == len(estado["carteira"]):
+        vi = estado["valor_inicial"]
+        kpis = {"valor_inicial": vi, "valor_final": vi if len(estado["carteira"]) > len(excluidos) else 0.0,
+                "div_acum": 0.0, "ret_total": 0.0 if vi > 0 else np.nan, "cagr": np.nan}
+        return pd.DataFrame(), kpis, excluidos
+    timeline = pd.DataFrame({
+        "Ano": units["anos"], "Trimestre": units["tris"],
+        "Valor_Sem_Dividendos": estado["valor"], "Dividendos_Trimestre": estado["div"],
+    })
+    return timeline, _kpis_from_totals(estado["valor_inicial"], estado["valor"], estado["div"]), excluidos
+
+
+def cached_derived(res: dict, name: str, fn):
+    """
+    Tabela derivada (gráficos) guardada junto do resultado em cache; calcula só na 1ª vez.
+    Os bytes entram na conta da entrada (SIM_CACHE_MAX_BYTES continua valendo): se a entrada
+    passaria sozinha do limite o valor não é guardado, e as demais são despejadas se preciso.
+    """
+    global _SIM_CACHE_BYTES
+    if name in res:
+        return res[name]
+    valor = fn()
+    nbytes = _result_nbytes(valor)
+    with _SIM_CACHE_LOCK:
+        hit = _SIM_CACHE.get(res.get("_key"))
+        if hit is None or hit[0] is not res:
+            res[name] = valor                  # resultado fora do cache: vale só para este rerun
+        elif hit[1] + nbytes <= SIM_CACHE_MAX_BYTES:
+            res[name] = valor
+            _SIM_CACHE[res["_key"]] = (res, hit[1] + nbytes)
+            _SIM_CACHE.move_to_end(res["_key"])
+            _SIM_CACHE_BYTES += nbytes
+            _sim_cache_evict()
+    return valor
 
 def _prep_timeline_quarterly(timeline: pd.DataFrame) -> pd.DataFrame:
     tl = timeline.copy()
@@ -420,29 +1049,159 @@ def _prep_metrics_quarterly(tl: pd.DataFrame, valor_inicial: float) -> tuple[pd.
               (float(hit) if np.isfinite(hit) else np.nan), \
               (float(mmdd) if np.isfinite(mmdd) else np.nan)
 
-@st.cache_data(show_spinner=True)
-def load_base(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path, sep=",", decimal=".", encoding="utf-8-sig", engine="python")
-    # Tipos básicos
-    if "Data_Referencia" in df.columns:
-        df["Data_Referencia"] = pd.to_datetime(df["Data_Referencia"], errors="coerce")
-        df = df[df["Data_Referencia"] < "2025-05-01"]  # filtra datas inválidas
+def _build_lista_base(df_src: pd.DataFrame) -> pd.DataFrame:
+    df = df_src.copy()
     # Normaliza campos numéricos usados nos filtros (garantir coerção)
     for col in ["Dividend_Yield", "Preco_Lucro", "ROE"]:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce")
+    # período (Ano/Trimestre) resolvido uma vez, não a cada rerun da página
+    if "Data_Referencia" in df.columns:
+        df["Ano"] = df["Data_Referencia"].dt.year.astype("Int64")
+        df["Trimestre"] = df["Data_Referencia"].dt.quarter.astype("Int64")
     return df
 
-@st.cache_data(show_spinner=False)
-def latest_snapshot(df: pd.DataFrame) -> pd.DataFrame:
-    """Mantém apenas a última linha por Ticker, com base em Data_Referencia."""
-    if "Data_Referencia" in df.columns:
-        idx = df.sort_values(["Ticker", "Data_Referencia"]).groupby("Ticker")["Data_Referencia"].idxmax()
-        snap = df.loc[idx].copy()
-    else:
-        snap = df.drop_duplicates(subset=["Ticker"]).copy()
+
+def load_base(path: str) -> pd.DataFrame:
+    """Base da página Lista (visão do catálogo; somente leitura)."""
+    return catalog.view(path, "lista_base", _build_lista_base)
+
+def _build_period_snapshots(df: pd.DataFrame, latest: pd.DataFrame) -> dict:
+    """
+    Índice período -> snapshot (1 linha por Ticker, a mais recente dentro do período).
+    Chaves (FY, FQ); None faz o papel de "Selecione" (curinga) em qualquer das posições.
+    latest: snapshot sem período (catalog.latest_snapshot já no formato da Lista).
+    """
+    snaps = {}
+    if df.empty or "Data_Referencia" not in df.columns:
+        snaps[(None, None)] = df
+        return snaps
+    snaps[(None, None)] = latest
+    for keys in (["Ano", "Trimestre"], ["Ano"], ["Trimestre"]):
+        idx = df.groupby(keys + ["Ticker"], observed=True)["Data_Referencia"].idxmax().dropna()
+        pos = idx.reset_index(name="_row")
+        for k, g in pos.groupby(keys, observed=True):
+            k = dict(zip(keys, k if isinstance(k, tuple) else (k,)))
+            chave = (int(k["Ano"]) if "Ano" in k else None, int(k["Trimestre"]) if "Trimestre" in k else None)
+            snaps[chave] = df.loc[g["_row"].to_numpy()].sort_values("Ticker").reset_index(drop=True)
+    return snaps
+
+
+def lista_snapshots(path: str) -> dict:
+    """Snapshots por período da base da Lista, construídos uma vez por versão da base."""
+    # sem período: a última linha por Ticker do catálogo, com as colunas derivadas da Lista
+    return catalog.view(path, "lista_snapshots", lambda _src: _build_period_snapshots(
+        load_base(path), _build_lista_base(catalog.latest_snapshot(path))))
+
+
+def lista_snapshot(path: str, fy=None, fq=None) -> pd.DataFrame:
+    """1 linha por Ticker para o período (None = "Selecione"); lookup no índice, sem reagrupar."""
+    snaps = lista_snapshots(path)
+    snap = snaps.get((fy, fq))
+    if snap is None:
+        snap = snaps[(None, None)].iloc[0:0]
     return snap
 
+
+def _period_index(path: str, name: str, fy, fq, builder):
+    """
+    Índice por período (faixas, busca) guardado num LRU próprio (até LISTA_PERIODOS_MAX
+    períodos) dentro de UMA visão do catálogo por tipo de índice: navegar por muitos
+    períodos não despeja do cache do catálogo as visões caras (painel, cubo, snapshots).
+    """
+    cache = catalog.view(path, name, lambda _src: {"lock": threading.Lock(), "idx": OrderedDict()})
+    with cache["lock"]:
+        idx = cache["idx"].get((fy, fq))
+        if idx is not None:
+            cache["idx"].move_to_end((fy, fq))
+            return idx
+    idx = builder()
+    with cache["lock"]:
+        cache["idx"][(fy, fq)] = idx
+        while len(cache["idx"]) > LISTA_PERIODOS_MAX:
+            cache["idx"].popitem(last=False)
+    return idx
+
+
+def lista_range_index(path: str, fy=None, fq=None) -> dict:
+    """Índice de faixas (screener) do snapshot do período: limites dos sliders + valores ordenados."""
+    return _period_index(path, "lista_ranges", fy, fq,
+                         lambda: screener.build_range_index(lista_snapshot(path, fy, fq)))
+
+
+def lista_search_index(path: str, fy=None, fq=None) -> dict:
+    """Índice de busca de tickers (ticker_search) sobre as linhas do snapshot do período."""
+    return _period_index(path, "lista_search", fy, fq,
+                         lambda: ticker_search.build_index(lista_snapshot(path, fy, fq)["Ticker"]))
+
+
+def lista_years(path: str) -> list:
+    """Anos disponíveis na base da Lista (mais recente primeiro)."""
+    return sorted({fy for fy, _ in lista_snapshots(path) if fy is not None}, reverse=True)
+
+
+def sector_cube(path: str, sector_col: str, quarterly: bool = False) -> pd.DataFrame:
+    """Cubo (setor, FY[, FQ], indicador) -> mean/median/p25/p75/count; montado uma vez por versão da base."""
+    nome = f"sector_cube|{sector_col}|{'FQ' if quarterly else 'FY'}"
+    return catalog.view(path, nome, lambda src: sector_stats.build_cube(src, sector_col, quarterly))
+
+
+def sector_stats_for(path: str, sector_col: str, sector, fy: int) -> pd.DataFrame:
+    """Estatísticas do setor no FY (indicador x mean/median/p25/p75/count); vazio se não houver."""
+    cube = sector_cube(path, sector_col)
+    if sector is None or sector == "—":
+        return cube.iloc[0:0]
+    return sector_stats.lookup(cube, sector, int(fy))
+
+
+def downsample(df: pd.DataFrame, budget: int) -> pd.DataFrame:
+    """
+    Reduz uma série ordenada a no máximo `budget` pontos: linhas consecutivas viram
+    blocos e cada bloco vira um ponto (média das colunas numéricas, 1ª data do bloco).
+    Abaixo do orçamento devolve o próprio frame.
+    """
+    n = len(df)
+    if budget is None or budget <= 0 or n <= budget:
+        return df
+    bloco = np.arange(n) * budget // n
+    num = df.select_dtypes(include="number")
+    out = num.groupby(bloco).mean()
+    for c in df.columns.difference(num.columns, sort=False):
+        out[c] = df[c].groupby(bloco).first()
+    return out[list(df.columns)].reset_index(drop=True)
+
+
+def indicator_history(path: str, ticker: str, cols: list, sector_col: str = None,
+                      sector=None, budget: int = 200) -> pd.DataFrame:
+    """
+    Séries trimestrais dos indicadores do ticker (+ mediana do setor, se informado),
+    em formato longo: Periodo, Indicador, Serie, Valor. Cada série respeita `budget`.
+    """
+    q = catalog.ticker_quarters(path, ticker)
+    cols = [c for c in cols if c in q.columns]
+    if q.empty or not cols:
+        return pd.DataFrame(columns=["Periodo", "Indicador", "Serie", "Valor"])
+    periodo = pd.to_datetime(pd.DataFrame({"year": q["FY"].astype(int), "month": q["FQ"].astype(int) * 3, "day": 1}))
+    cq = sector_cube(path, sector_col, quarterly=True) if sector_col and sector not in (None, "—") else None
+
+    partes = []
+    for col in cols:
+        serie = pd.DataFrame({"Periodo": periodo.to_numpy(), "Valor": pd.to_numeric(q[col], errors="coerce").to_numpy()})
+        serie = downsample(serie.dropna(subset=["Valor"]), budget)
+        partes.append(serie.assign(Indicador=col, Serie=str(ticker)))
+        if cq is not None:
+            med = sector_stats.series(cq, sector, col, "median").dropna()
+            if not med.empty:
+                fy_, fq_ = med.index.get_level_values(0), med.index.get_level_values(1)
+                med = pd.DataFrame({
+                    "Periodo": pd.to_datetime(pd.DataFrame({"year": fy_, "month": np.asarray(fq_) * 3, "day": 1})).to_numpy(),
+                    "Valor": med.to_numpy(),
+                })
+                med = med[(med["Periodo"] >= serie["Periodo"].min()) & (med["Periodo"] <= serie["Periodo"].max())]
+                partes.append(downsample(med, budget).assign(Indicador=col, Serie="Mediana do setor"))
+    return pd.concat(partes, ignore_index=True)[["Periodo", "Indicador", "Serie", "Valor"]]
+
+
 def _sync_filters_from_query():
     """Se o filtro ainda não está no session_state, popula a partir de st.query_params."""
     qp = st.query_params
@@ -482,6 +1241,3 @@ def goto(page: str, **overrides):
     st.query_params.update(payload)
     st.session_state["page"] = page
     st.rerun()
-
-
-    
\ No newline at end of file
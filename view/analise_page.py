@@ -1,13 +1,19 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import altair as alt
 import controller.utils as utils
+import controller.catalog as catalog
+import controller.sector_stats as sector_stats
 
 
 # =======================
 # Pagina 3 - Analise aprofundada
 # =======================
 
+HIST_DEFAULT_COLS = ["Preco_Lucro", "ROE", "Margem_Liquida_Sector", "Divida_Liquida_EBIT"]
+HIST_POINT_BUDGET = 120   # pontos por série antes de chegar ao Altair (blocos agregados pela média)
+
 def _abbr_currency(v: float) -> str:
     if not np.isfinite(v):
         return "n/d"
@@ -59,13 +65,13 @@ def render_analise():
         st.header("Análise aprofundada da ação")
 
     # Carrega base e filtros herdados da Página 1
-    df_full = utils.load_base_full("src/base_para_simulador_indicadores_refatorado.csv")
+    df_full = utils.load_base_full(catalog.BASE_FULL)
     tck, fy, fq = _get_session_filters_for_analysis()
 
     # Se não há Ticker definido, deixa o usuário escolher agora (apenas aqui)
     if not tck:
         st.info("Selecione um **Ticker** para analisar.")
-        lista = sorted(df_full["Ticker"].dropna().unique().tolist())
+        lista = catalog.tickers(catalog.BASE_FULL)
         picked = st.selectbox("Ticker", options=lista, index=None, placeholder="Escolha o papel", key="analise_pick_ticker")
         if picked:
             st.session_state["analise_ticker"] = str(picked).upper()
@@ -78,9 +84,12 @@ def render_analise():
         return
 
     # Fatiamento: atual (FY) e anterior (FY-1)
-    df_t = df_full[df_full["Ticker"] == tck].copy()
-    df_cur = df_t[df_t["FY"] == fy].copy()
-    df_prev = df_t[df_t["FY"] == (fy - 1)].copy()
+    df_t = catalog.ticker_slice(catalog.BASE_FULL, tck)  # lookup indexado, sem varrer a base
+    df_cur = df_t[df_t["FY"] == fy]
+    df_prev = df_t[df_t["FY"] == (fy - 1)]
+    # última linha de cada FY: lookup na tabela (Ticker, FY), uma vez por render
+    row_cur = catalog.latest_row(catalog.BASE_FULL, tck, fy)
+    row_prev = catalog.latest_row(catalog.BASE_FULL, tck, fy - 1)
 
     if df_cur.empty:
         st.warning(f"Não há dados para {tck} no FY {fy}. Ajuste o filtro de Ano na Página 1.")
@@ -119,24 +128,20 @@ def render_analise():
         st.subheader("Valuation")
 
         setor_col = "Setor_Oficial_final" if "Setor_Oficial_final" in df_full.columns else "Setor_Oficial"
-        setor_val = utils._latest_row(df_cur).get(setor_col, "—")
+        setor_val = row_cur.get(setor_col, "—")
 
         # Indicadores (menor = melhor)
         val_cols = ["EV_EBIT", "Preco_Lucro", "Preco_PVP", "Payout_TTM", "EV_Receita"]
         better_low = {"EV_EBIT", "Preco_Lucro", "Preco_PVP", "Payout_TTM", "EV_Receita"}
 
-        df_sec = df_full[(df_full[setor_col] == setor_val) & (df_full["FY"] == fy)].copy() if setor_val != "—" else pd.DataFrame()
+        sec_stats = utils.sector_stats_for(catalog.BASE_FULL, setor_col, setor_val, fy)  # cubo pré-computado
 
         cards = []
         for col in val_cols:
-            v_cur, v_prev = utils._get_pair(df_cur, df_prev, col)
+            v_cur, v_prev = utils._get_pair(row_cur, row_prev, col)
 
             # média do setor no FY corrente
-            if not df_sec.empty and col in df_sec.columns:
-                sec_series = pd.to_numeric(df_sec[col], errors="coerce")
-                sec_mean = float(sec_series.mean()) if sec_series.notna().any() else np.nan
-            else:
-                sec_mean = np.nan
+            sec_mean = sector_stats.stat(sec_stats, col)
 
             # valor mostrado (bruto; mantenho formato simples para múltiplos)
             value_str = f"{v_cur:.2f}" if np.isfinite(v_cur) else "n/d"
@@ -177,23 +182,19 @@ def render_analise():
 
         # Definição de setor do papel
         setor_col = "Setor_Oficial_final" if "Setor_Oficial_final" in df_full.columns else "Setor_Oficial"
-        setor_val = utils._latest_row(df_cur).get(setor_col, "—")
+        setor_val = row_cur.get(setor_col, "—")
 
         # Indicadores (maior = melhor)
         luc_cols = ["ROE", "ROIC", "Margem_EBIT_Sector", "Margem_Liquida_Sector", "Margem_Bruta"]
 
-        df_sec = df_full[(df_full[setor_col] == setor_val) & (df_full["FY"] == fy)].copy() if setor_val != "—" else pd.DataFrame()
+        sec_stats = utils.sector_stats_for(catalog.BASE_FULL, setor_col, setor_val, fy)  # cubo pré-computado
 
         cards = []
         for col in luc_cols:
-            v_cur, v_prev = utils._get_pair(df_cur, df_prev, col)  # fração (ex.: 0.123)
+            v_cur, v_prev = utils._get_pair(row_cur, row_prev, col)  # fração (ex.: 0.123)
 
             # média setorial (fração) no FY corrente
-            if not df_sec.empty and col in df_sec.columns:
-                sec_series = pd.to_numeric(df_sec[col], errors="coerce")
-                sec_mean = float(sec_series.mean()) if sec_series.notna().any() else np.nan
-            else:
-                sec_mean = np.nan
+            sec_mean = sector_stats.stat(sec_stats, col)
 
             # valor mostrado (%)
             value_str = f"{(v_cur * 100):.2f}%" if np.isfinite(v_cur) else "n/d"
@@ -233,7 +234,7 @@ def render_analise():
         st.subheader("Eficiência operacional")
 
         setor_col = "Setor_Oficial_final" if "Setor_Oficial_final" in df_full.columns else "Setor_Oficial"
-        setor_val = utils._latest_row(df_cur).get(setor_col, "—")
+        setor_val = row_cur.get(setor_col, "—")
 
         is_fin = False
         if isinstance(setor_val, str):
@@ -253,7 +254,7 @@ def render_analise():
         eff_cols = ["Giro_Ativos", cols_receita, col_ebit]
         labels = {"Giro_Ativos": "Giro de Ativos", cols_receita: "Receita", col_ebit: "EBIT/Operacional"}
 
-        df_sec = df_full[(df_full[setor_col] == setor_val) & (df_full["FY"] == fy)].copy() if setor_val != "—" else pd.DataFrame()
+        sec_stats = utils.sector_stats_for(catalog.BASE_FULL, setor_col, setor_val, fy)  # cubo pré-computado
 
         def _fmt_eff(col, v):
             if not np.isfinite(v):
@@ -266,14 +267,10 @@ def render_analise():
 
         cards = []
         for col in eff_cols:
-            v_cur, v_prev = utils._get_pair(df_cur, df_prev, col)
+            v_cur, v_prev = utils._get_pair(row_cur, row_prev, col)
 
             # média setorial no FY corrente (mesma unidade da métrica)
-            if not df_sec.empty and col in df_sec.columns:
-                sec_series = pd.to_numeric(df_sec[col], errors="coerce")
-                sec_mean = float(sec_series.mean()) if sec_series.notna().any() else np.nan
-            else:
-                sec_mean = np.nan
+            sec_mean = sector_stats.stat(sec_stats, col)
 
             value_str = _fmt_eff(col, v_cur)
 
@@ -318,7 +315,7 @@ def render_analise():
             st.subheader("Estrutura de capital & Liquidez")
 
             setor_col = "Setor_Oficial_final" if "Setor_Oficial_final" in df_full.columns else "Setor_Oficial"
-            setor_val = utils._latest_row(df_cur).get(setor_col, "—")
+            setor_val = row_cur.get(setor_col, "—")
 
             cap_cols = [
                 "Net_Debt",
@@ -342,7 +339,7 @@ def render_analise():
                 "Capital_Giro": "Capital de Giro",
             }
 
-            df_sec = df_full[(df_full[setor_col] == setor_val) & (df_full["FY"] == fy)].copy() if setor_val != "—" else pd.DataFrame()
+            sec_stats = utils.sector_stats_for(catalog.BASE_FULL, setor_col, setor_val, fy)  # cubo pré-computado
 
             def _fmt_cap(col, v):
                 if not np.isfinite(v):
@@ -374,14 +371,10 @@ def render_analise():
 
             cards = []
             for col in cap_cols:
-                v_cur, v_prev = utils._get_pair(df_cur, df_prev, col)
+                v_cur, v_prev = utils._get_pair(row_cur, row_prev, col)
 
                 # média setorial no FY (mesma unidade da métrica)
-                if not df_sec.empty and col in df_sec.columns:
-                    sec_series = pd.to_numeric(df_sec[col], errors="coerce")
-                    sec_mean = float(sec_series.mean()) if sec_series.notna().any() else np.nan
-                else:
-                    sec_mean = np.nan
+                sec_mean = sector_stats.stat(sec_stats, col)
 
                 value_str = _fmt_cap(col, v_cur)
 
@@ -437,7 +430,7 @@ def render_analise():
 
         # Detecta financeiro (para escolher a coluna correta de Receita por ação)
         setor_col = "Setor_Oficial_final" if "Setor_Oficial_final" in df_full.columns else "Setor_Oficial"
-        setor_val = utils._latest_row(df_cur).get(setor_col, "—")
+        setor_val = row_cur.get(setor_col, "—")
         is_fin = False
         if isinstance(setor_val, str):
             s = setor_val.lower()
@@ -448,21 +441,21 @@ def render_analise():
             receita_ps_col = "Receita_Total_per_share" if "Receita_Total_per_share" in df_full.columns else "Receita_Liquida_per_share"
 
         # Base setorial no FY corrente
-        df_sec = df_full[(df_full[setor_col] == setor_val) & (df_full["FY"] == fy)].copy() if setor_val != "—" else pd.DataFrame()
+        sec_stats = utils.sector_stats_for(catalog.BASE_FULL, setor_col, setor_val, fy)  # cubo pré-computado
 
         # DPS (dividendo por ação) FY — calcula par FY/FY-1
-        def _get_dps_pair(df_c: pd.DataFrame, df_p: pd.DataFrame):
-            def _extract(df_):
+        def _get_dps_pair(df_c: pd.DataFrame, df_p: pd.DataFrame, r_c: pd.Series, r_p: pd.Series):
+            def _extract(df_, row):
                 if "DPS_FY" in df_.columns and df_["DPS_FY"].notna().any():
-                    return utils._to_num(utils._latest_row(df_).get("DPS_FY"))
-                div = utils._to_num(utils._latest_row(df_).get("Dividendos_FY")) if "Dividendos_FY" in df_.columns else np.nan
-                jcp = utils._to_num(utils._latest_row(df_).get("Juros_Sobre_Capital_Proprio_FY")) if "Juros_Sobre_Capital_Proprio_FY" in df_.columns else np.nan
-                shs = utils._to_num(utils._latest_row(df_).get("Acoes_Emitidas")) if "Acoes_Emitidas" in df_.columns else np.nan
+                    return utils._to_num(row.get("DPS_FY"))
+                div = utils._to_num(row.get("Dividendos_FY")) if "Dividendos_FY" in df_.columns else np.nan
+                jcp = utils._to_num(row.get("Juros_Sobre_Capital_Proprio_FY")) if "Juros_Sobre_Capital_Proprio_FY" in df_.columns else np.nan
+                shs = utils._to_num(row.get("Acoes_Emitidas")) if "Acoes_Emitidas" in df_.columns else np.nan
                 if np.isfinite(div) or np.isfinite(jcp):
                     num = (0 if not np.isfinite(div) else div) + (0 if not np.isfinite(jcp) else jcp)
                     return (num / shs) if (np.isfinite(shs) and shs > 0) else np.nan
                 return np.nan
-            return _extract(df_c), _extract(df_p)
+            return _extract(df_c, r_c), _extract(df_p, r_p)
 
         # Itens do cluster (coluna, rótulo, tipo="money"|"rate")
         pa_items = [
@@ -509,14 +502,10 @@ def render_analise():
 
         # Monta cards para LPA/VPA/EBIT_ps/Receita_ps + Payout/DY/DY5y
         for col, label, kind in pa_items:
-            v_cur, v_prev = utils._get_pair(df_cur, df_prev, col)
+            v_cur, v_prev = utils._get_pair(row_cur, row_prev, col)
 
             # média setorial (FY)
-            if not df_sec.empty and col in df_sec.columns:
-                sec_series = pd.to_numeric(df_sec[col], errors="coerce")
-                sec_mean = float(sec_series.mean()) if sec_series.notna().any() else np.nan
-            else:
-                sec_mean = np.nan
+            sec_mean = sector_stats.stat(sec_stats, col)
 
             value_str = _fmt_pa(kind, v_cur)
 
@@ -540,23 +529,11 @@ def render_analise():
             cards.append((label, value_str, delta_str, delta_cor, delta_context))
 
         # --- Card de DPS (FY) ---
-        dps_cur, dps_prev = _get_dps_pair(df_cur, df_prev)
+        dps_cur, dps_prev = _get_dps_pair(df_cur, df_prev, row_cur, row_prev)
         value_str = _fmt_pa("money", dps_cur)
 
         # média setorial p/ DPS (com fallback de composição)
-        if not df_sec.empty:
-            if "DPS_FY" in df_sec.columns:
-                sec_dps_mean = pd.to_numeric(df_sec["DPS_FY"], errors="coerce").mean()
-            elif {"Dividendos_FY", "Juros_Sobre_Capital_Proprio_FY", "Acoes_Emitidas"}.issubset(df_sec.columns):
-                _num = pd.to_numeric(df_sec["Dividendos_FY"], errors="coerce").fillna(0) + \
-                    pd.to_numeric(df_sec["Juros_Sobre_Capital_Proprio_FY"], errors="coerce").fillna(0)
-                _den = pd.to_numeric(df_sec["Acoes_Emitidas"], errors="coerce")
-                sec_dps_series = _num / _den.replace(0, np.nan)
-                sec_dps_mean = sec_dps_series.mean()
-            else:
-                sec_dps_mean = np.nan
-        else:
-            sec_dps_mean = np.nan
+        sec_dps_mean = sector_stats.stat(sec_stats, "DPS_FY")
 
         txt_sec_dps, raw_sec_dps = _delta_text_pa("money", dps_cur, sec_dps_mean)
         txt_yoy_dps, raw_yoy_dps = _delta_text_pa("money", dps_cur, dps_prev)
@@ -598,6 +575,45 @@ def render_analise():
         st.markdown("---")
 
 
+    with st.container():
+        st.subheader("Evolução histórica (trimestral)")
+
+        cube_q = utils.sector_cube(catalog.BASE_FULL, setor_col, quarterly=True)
+        opcoes = sorted(set(cube_q.index.get_level_values("indicador"))) if not cube_q.empty else []
+        hc1, hc2 = st.columns([4, 1])
+        with hc1:
+            hist_cols = st.multiselect(
+                "Indicadores", options=opcoes,
+                default=[c for c in HIST_DEFAULT_COLS if c in opcoes] or opcoes[:2],
+                key="analise_hist_cols",
+            )
+        with hc2:
+            budget = st.number_input("Pontos por série", min_value=20, max_value=1000,
+                                     value=HIST_POINT_BUDGET, step=20, key="analise_hist_budget")
+
+        hist = utils.indicator_history(catalog.BASE_FULL, tck, hist_cols, setor_col, setor_val, int(budget))
+        if hist.empty:
+            st.caption("Sem série histórica para os indicadores escolhidos.")
+        else:
+            graf = st.columns(2)
+            for i, col in enumerate(hist_cols):
+                dados = hist[hist["Indicador"] == col]
+                if dados.empty:
+                    continue
+                chart = alt.Chart(dados).mark_line(point=len(dados) <= 60).encode(
+                    x=alt.X("Periodo:T", title=None),
+                    y=alt.Y("Valor:Q", title=None),
+                    color=alt.Color("Serie:N", legend=alt.Legend(orient="bottom", title=None)),
+                    strokeDash=alt.condition(alt.datum.Serie == "Mediana do setor", alt.value([4, 3]), alt.value([1, 0])),
+                    tooltip=[alt.Tooltip("Serie:N", title="Série"),
+                             alt.Tooltip("Periodo:T", title="Período", format="%Y-%m"),
+                             alt.Tooltip("Valor:Q", format=",.4f")],
+                ).properties(title=col, height=220)
+                with graf[i % 2]:
+                    st.altair_chart(chart, use_container_width=True)
+            st.caption("Linha tracejada: mediana do setor no trimestre. Séries longas são agregadas em blocos (média) até o limite de pontos.")
+        st.markdown("---")
+
     with st.container():
         st.subheader("Dados utilizados")
 
@@ -623,8 +639,8 @@ def render_analise():
             # indicadores calculados sem sufixo
             return "Calc/Spot"
 
-        cur_row = utils._latest_row(df_cur)
-        prev_row = utils._latest_row(df_prev) if not df_prev.empty else pd.Series(dtype="float64")
+        cur_row = row_cur
+        prev_row = row_prev if not df_prev.empty else pd.Series(dtype="float64")
 
         out = []
         for col in cols_show:
@@ -2,34 +2,14 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import controller.utils as utils
+import controller.history_store as history_store
 import altair as alt
-import os
-
-HISTORY_FILE = "src/sim_history.csv"
 
 # =======================
 # Pagina 4 - Historico simulações
 # =======================
 
-def _ensure_sim_history():
-    if "sim_history" not in st.session_state:
-        st.session_state["sim_history"] = []
-    # carrega do CSV só uma vez
-    if os.path.exists(HISTORY_FILE) and not st.session_state.get("_hist_loaded", False):
-        try:
-            df = pd.read_csv(HISTORY_FILE, encoding="utf-8-sig")
-            st.session_state["sim_history"] = df.to_dict("records")
-        except Exception:
-            pass
-        st.session_state["_hist_loaded"] = True
-
-
-
-
 def render_historico():
-    # --- garante estrutura do histórico na sessão ---
-    _ensure_sim_history()
-
     st.header("Histórico de simulações")
 
     # voltar sem resetar filtros/carteira da página 1
@@ -37,60 +17,32 @@ def render_historico():
         utils.goto("lista")
         return
 
-    hist = st.session_state.get("sim_history", [])
-    if not hist:
+    # domínios dos filtros calculados direto no store (sem carregar o histórico)
+    stats = history_store.run_stats()
+    if stats["n"] == 0:
         st.info("Nenhuma simulação salva ainda. Faça uma simulação na Página 2.")
         return
 
-    # ---------------- Base e tipos ----------------
-    dfh = pd.DataFrame(hist).copy()
-
-    if "timestamp" in dfh.columns:
-        dfh["timestamp"] = pd.to_datetime(dfh["timestamp"], errors="coerce")
-
-    for c in [
-        "base_fy", "base_fq", "end_fy", "end_fq", "n_tickers",
-        "valor_inicial", "valor_final", "div_acum",
-        "ret_total", "ret_sem_div", "cagr", "vol_anual", "hit_ratio", "max_dd"
-    ]:
-        if c in dfh.columns:
-            dfh[c] = pd.to_numeric(dfh[c], errors="coerce")
-
     # ---------------- Callback: só marca flag ----------------
     def _reset_hist_filters_cb():
         st.session_state["_hist_filters_reset"] = True
 
     # ---------------- Cálculo dos defaults dinâmicos ----------------
-    fy_opts_base = ["(Todos)"] + (
-        sorted(dfh["base_fy"].dropna().astype(int).unique(), reverse=True)
-        if "base_fy" in dfh.columns else []
-    )
-    fq_opts_base = ["(Todos)"] + (
-        sorted(dfh["base_fq"].dropna().astype(int).unique())
-        if "base_fq" in dfh.columns else []
-    )
-
-    fy_opts_end = ["(Todos)"] + (
-        sorted(dfh["end_fy"].dropna().astype(int).unique(), reverse=True)
-        if "end_fy" in dfh.columns else []
-    )
-    fq_opts_end = ["(Todos)"] + (
-        sorted(dfh["end_fq"].dropna().astype(int).unique())
-        if "end_fq" in dfh.columns else []
-    )
+    fy_opts_base = ["(Todos)"] + sorted(stats["base_fy"], reverse=True)
+    fq_opts_base = ["(Todos)"] + stats["base_fq"]
+    fy_opts_end = ["(Todos)"] + sorted(stats["end_fy"], reverse=True)
+    fq_opts_end = ["(Todos)"] + stats["end_fq"]
 
     rmin = rmax = None
-    if "ret_total" in dfh.columns and dfh["ret_total"].notna().any():
-        ret_pct = (dfh["ret_total"] * 100).astype(float)
-        rmin, rmax = float(np.nanmin(ret_pct)), float(np.nanmax(ret_pct))
+    if stats["ret_min"] is not None and stats["ret_max"] is not None:
+        rmin, rmax = float(stats["ret_min"]), float(stats["ret_max"])
 
     dmin = dmax = None
-    if "timestamp" in dfh.columns and dfh["timestamp"].notna().any():
-        dmin = pd.to_datetime(dfh["timestamp"]).min().date()
-        dmax = pd.to_datetime(dfh["timestamp"]).max().date() 
+    if pd.notna(stats["date_min"]) and pd.notna(stats["date_max"]):
+        dmin = stats["date_min"].date()
+        dmax = stats["date_max"].date()
 
-    options_ids = dfh["sim_id"].tolist() if "sim_id" in dfh.columns else []
-    default_ms = options_ids[:2] if len(options_ids) >= 2 else options_ids
+    default_ms = history_store.query_runs(limit=2)["sim_id"].tolist()
 
     # ---------------- Cabeçalho de filtros + reset ----------------
     row = st.columns([6, 1])
@@ -153,96 +105,96 @@ def render_historico():
     term = colE.text_input("Buscar por Ticker (ex.: ABCB4)", key="hist_term")
 
 
-    # ---------------- Aplica filtros ao DF ----------------
-    m = pd.Series(True, index=dfh.index)
-
-    if "base_fy" in dfh.columns and base_fy_sel != "(Todos)":
-        m &= (dfh["base_fy"] == int(base_fy_sel))
-    if "base_fq" in dfh.columns and base_fq_sel != "(Todos)":
-        m &= (dfh["base_fq"] == int(base_fq_sel))
-    if "end_fy" in dfh.columns and end_fy_sel != "(Todos)":
-        m &= (dfh["end_fy"] == int(end_fy_sel))
-    if "end_fq" in dfh.columns and end_fq_sel != "(Todos)":
-        m &= (dfh["end_fq"] == int(end_fq_sel))
-
-    if term and "tickers" in dfh.columns:
-        def _has_term(v):
-            if isinstance(v, (list, tuple)):
-                return any(term.upper() in str(x).upper() for x in v)
-            return term.upper() in str(v).upper()
-        m &= dfh["tickers"].apply(_has_term)
-
-    if "n_tickers" in dfh.columns:
-        m &= (dfh["n_tickers"] >= int(st.session_state.get("hist_min_tk", 1)))
+    # ---------------- Filtros -> consulta no store ----------------
+    def _opt(v):
+        return None if v == "(Todos)" else int(v)
 
-    if ("ret_total" in dfh.columns) and ("hist_ret_range" in st.session_state):
-        lo, hi = st.session_state["hist_ret_range"]
-        m &= ((dfh["ret_total"] * 100) >= lo) & ((dfh["ret_total"] * 100) <= hi)
-
-    if ("timestamp" in dfh.columns) and ("hist_date_range" in st.session_state):
-        d0, d1 = st.session_state["hist_date_range"]
-        m &= dfh["timestamp"].dt.date.between(d0, d1)
+    filtros = {
+        "base_fy": _opt(base_fy_sel), "base_fq": _opt(base_fq_sel),
+        "end_fy": _opt(end_fy_sel), "end_fq": _opt(end_fq_sel),
+        "term": term.strip() or None,
+        "min_tickers": int(st.session_state.get("hist_min_tk", 1)),
+        "ret_range": st.session_state.get("hist_ret_range"),
+        "date_range": st.session_state.get("hist_date_range"),
+    }
 
-    dfh_f = dfh[m].copy()
-    if dfh_f.empty:
+    total = history_store.count_runs(**filtros)
+    if total == 0:
         st.info("Nenhuma simulação corresponde aos filtros selecionados.")
         return
 
-    if "timestamp" in dfh_f.columns:
-        dfh_f = dfh_f.sort_values("timestamp", ascending=False)
+    # paginação: só a página visível é carregada do banco
+    page_size = colF.selectbox("Simulações por página", options=[25, 50, 100, 200], index=1, key="hist_page_size")
+    n_pages = max(1, -(-total // page_size))
+    if st.session_state.get("hist_page", 1) > n_pages:
+        st.session_state["hist_page"] = 1
+    page = st.number_input(f"Página (de {n_pages})", min_value=1, max_value=n_pages, step=1, key="hist_page")
+
+    dfh_f = history_store.query_runs(limit=page_size, offset=(int(page) - 1) * page_size, **filtros)
+    dfh_f["timestamp"] = pd.to_datetime(dfh_f["timestamp"], errors="coerce")
+    st.caption(f"{total} simulações encontradas — exibindo {len(dfh_f)} (página {int(page)} de {n_pages}).")
 
     # ---------------- Tabela sintética ----------------
-    cols_order = [
-        "sim_id", "timestamp",
-        "base_fy", "base_fq", "end_fy", "end_fq",
-        "n_tickers", "tickers",
-        "valor_inicial", "valor_final", "div_acum",
-        "ret_sem_div", "ret_total", "cagr",
-        "vol_anual", "hit_ratio", "max_dd"
-    ]
-    cols_order = [c for c in cols_order if c in dfh_f.columns]
-    tbl = dfh_f[cols_order].copy()
-
-    for c in ["valor_inicial", "valor_final", "div_acum"]:
-        if c in tbl.columns:
-            tbl[c] = pd.to_numeric(tbl[c], errors="coerce").round(2)
-
-    pct_map = {
-        "ret_sem_div": "Ret s/ Div (%)",
-        "ret_total": "Ret c/ Div (%)",
-        "cagr": "CAGR (%)",
-        "vol_anual": "Vol anual (%)",
-        "hit_ratio": "Hit ratio (%)",
-        "max_dd": "Máx. DD (%)",
-    }
-    for c, newc in pct_map.items():
-        if c in tbl.columns:
-            tbl[newc] = (pd.to_numeric(tbl[c], errors="coerce") * 100).round(2)
-    tbl = tbl.drop(columns=[c for c in pct_map if c in tbl.columns], errors="ignore")
-
-    tbl = tbl.rename(columns={
-        "sim_id": "ID",
-        "timestamp": "Quando",
-        "base_fy": "Base FY", "base_fq": "Base FQ",
-        "end_fy": "Fim FY", "end_fq": "Fim FQ",
-        "n_tickers": "#Tickers",
-        "tickers": "Tickers",
-        "valor_inicial": "Valor Inicial (R$)",
-        "valor_final": "Valor Final (R$)",
-        "div_acum": "Dividendos (R$)",
-    })
-
-    if "Tickers" in tbl.columns:
-        tbl["Tickers"] = tbl["Tickers"].apply(
-            lambda v: ", ".join(v) if isinstance(v, (list, tuple)) else (str(v) if pd.notna(v) else "")
-        )
+    def _tabela(dfh: pd.DataFrame) -> pd.DataFrame:
+        cols_order = [
+            "sim_id", "timestamp",
+            "base_fy", "base_fq", "end_fy", "end_fq",
+            "n_tickers", "tickers",
+            "valor_inicial", "valor_final", "div_acum",
+            "ret_sem_div", "ret_total", "cagr",
+            "vol_anual", "hit_ratio", "max_dd"
+        ]
+        cols_order = [c for c in cols_order if c in dfh.columns]
+        tbl = dfh[cols_order].copy()
+
+        for c in ["valor_inicial", "valor_final", "div_acum"]:
+            if c in tbl.columns:
+                tbl[c] = pd.to_numeric(tbl[c], errors="coerce").round(2)
+
+        pct_map = {
+            "ret_sem_div": "Ret s/ Div (%)",
+            "ret_total": "Ret c/ Div (%)",
+            "cagr": "CAGR (%)",
+            "vol_anual": "Vol anual (%)",
+            "hit_ratio": "Hit ratio (%)",
+            "max_dd": "Máx. DD (%)",
+        }
+        for c, newc in pct_map.items():
+            if c in tbl.columns:
+                tbl[newc] = (pd.to_numeric(tbl[c], errors="coerce") * 100).round(2)
+        tbl = tbl.drop(columns=[c for c in pct_map if c in tbl.columns], errors="ignore")
+
+        tbl = tbl.rename(columns={
+            "sim_id": "ID",
+            "timestamp": "Quando",
+            "base_fy": "Base FY", "base_fq": "Base FQ",
+            "end_fy": "Fim FY", "end_fq": "Fim FQ",
+            "n_tickers": "#Tickers",
+            "tickers": "Tickers",
+            "valor_inicial": "Valor Inicial (R$)",
+            "valor_final": "Valor Final (R$)",
+            "div_acum": "Dividendos (R$)",
+        })
+
+        if "Tickers" in tbl.columns:
+            tbl["Tickers"] = tbl["Tickers"].apply(
+                lambda v: ", ".join(v) if isinstance(v, (list, tuple)) else (str(v) if pd.notna(v) else "")
+            )
+        return tbl
 
+    def _csv_filtrado() -> str:
+        # exportação: todo o histórico filtrado (não só a página), gerado ao clicar
+        dfh = history_store.query_runs(**filtros)
+        dfh["timestamp"] = pd.to_datetime(dfh["timestamp"], errors="coerce")
+        return _tabela(dfh).to_csv(index=False, encoding="utf-8-sig")
+
+    tbl = _tabela(dfh_f)
     st.subheader("Lista de simulações")
     st.dataframe(tbl, use_container_width=True, hide_index=True)
 
     st.download_button(
         "Baixar histórico filtrado (.CSV)",
-        data=tbl.to_csv(index=False, encoding="utf-8-sig"),
+        data=_csv_filtrado,
         file_name="sim_history_export_filtrado.csv",
         mime="text/csv",
         key="btn_download_hist"
@@ -264,8 +216,17 @@ def render_historico():
         n = int(row.get('n_tickers', 0)) if pd.notna(row.get('n_tickers', np.nan)) else 0
         return f"{row['sim_id']} — {base}→{end} ({n} tkrs)"
 
+    # opções = página atual + simulações já selecionadas (mesmo que fora da página)
+    sel_prev = [str(x) for x in st.session_state.get("hist_simsel_cmp", [])]
+    fora = [x for x in sel_prev if x not in set(dfh_f["sim_id"])]
+    if fora:
+        extra = history_store.query_runs(sim_ids=fora)
+        extra["timestamp"] = pd.to_datetime(extra["timestamp"], errors="coerce")
+        dfh_f = pd.concat([dfh_f, extra], ignore_index=True)
+    st.session_state["hist_simsel_cmp"] = [x for x in sel_prev if x in set(dfh_f["sim_id"])]
+
     dfh_f["__label"] = dfh_f.apply(_fmt_label, axis=1)
-    options = dfh_f["sim_id"].tolist()
+    options = dfh_f["sim_id"].drop_duplicates().tolist()
     label_map = dict(zip(dfh_f["sim_id"], dfh_f["__label"]))
 
     sel = st.multiselect(
@@ -276,7 +237,7 @@ def render_historico():
     )
 
     if len(sel) >= 1:
-        cmp_df = dfh_f[dfh_f["sim_id"].isin(sel)].copy()
+        cmp_df = dfh_f[dfh_f["sim_id"].isin(sel)].drop_duplicates("run_key").copy()
 
         for c in ["ret_total", "ret_sem_div", "div_acum", "vol_anual", "max_dd"]:
             if c in cmp_df.columns:
@@ -1,10 +1,15 @@
 import streamlit as st
 import controller.utils as utils
+import controller.screener as screener
+import controller.ticker_search as ticker_search
 import pandas as pd
-import re
+import numpy as np
 from st_aggrid import AgGrid, GridOptionsBuilder
 
 DATA_FILE = "src/base_para_simulador_indicadores_refatorado_minimal.csv"  # caminho já OK no upload atual
+# tabela (AgGrid): colunas padrão e linhas por página enviadas ao navegador
+GRID_DEFAULT_COLS = ["Ticker", "Setor_Oficial_final", "Preco_Atual", "Dividend_Yield", "Preco_Lucro", "ROE"]
+GRID_PAGE_SIZE = 50
 
 @st.dialog("Adicionar ação à carteira")
 def adicionar_acao_dialog(ticker, preco_unitario):
@@ -36,6 +41,7 @@ def _reset_filtros():
     st.session_state["filtro_setor"] = "Selecione"
     st.session_state["filtro_ano"] = "Selecione"
     st.session_state["filtro_tri"] = "Selecione"
+    st.session_state.pop("lista_page", None)  # volta para a 1ª página da lista
 
     # st.rerun()
 
@@ -53,7 +59,8 @@ def render_lista():
         st.session_state["filtro_tri"] = str(st.session_state["filtro_tri"])
 
     try:
-        df_raw = utils.load_base(DATA_FILE)
+        # índice período -> snapshot (1 linha por Ticker), montado uma vez por versão da base
+        years = utils.lista_years(DATA_FILE)
     except Exception as e:
         st.error(f"Erro ao carregar a base: {e}")
         st.stop()
@@ -67,12 +74,6 @@ def render_lista():
 
         
         
-    # depois de ler o CSV em df_raw
-    df_raw["Data_Referencia"] = pd.to_datetime(df_raw["Data_Referencia"], errors="coerce")
-    df_raw["Ano"] = df_raw["Data_Referencia"].dt.year.astype("Int64")
-    df_raw["Trimestre"] = df_raw["Data_Referencia"].dt.quarter.astype("Int64")
-    
-    
     # seletores de ano e trimestre (strings homogêneas; estado lógico separado)
     col1, col2 = st.columns(2)
 
@@ -80,10 +81,6 @@ def render_lista():
     # Filtros: Ano e Trimestre
     # ====================
 
-    years = (
-        pd.to_numeric(df_raw["Ano"], errors="coerce")
-        .dropna().astype(int).sort_values(ascending=False).unique().tolist()
-    )
     fy_options = ["Selecione"] + [str(y) for y in years]
     fq_options = ["Selecione", "1", "2", "3", "4"]
 
@@ -114,28 +111,8 @@ def render_lista():
         st.session_state["_periodo_lock_portfolio"] = (new_fy, new_fq)
 
 
-    # base de trabalho conforme filtros (None = "Selecione")
-    df_f = df_raw.copy()
-    if new_fy is not None:
-        df_f = df_f[df_f["Ano"] == new_fy]
-    if new_fq is not None:
-        df_f = df_f[df_f["Trimestre"] == new_fq]
-
-
-    # garante 1 linha por Ticker: pega a mais recente dentro do subset filtrado
-    if not df_f.empty:
-        idx_last = df_f.groupby("Ticker")["Data_Referencia"].idxmax()
-        df = df_f.loc[idx_last].sort_values("Ticker").reset_index(drop=True)
-    else:
-        df = df_f
-
-
-    # garante 1 linha por Ticker: pega a mais recente dentro do subset filtrado
-    if not df_f.empty:
-        idx_last = df_f.groupby("Ticker")["Data_Referencia"].idxmax()
-        df = df_f.loc[idx_last].sort_values("Ticker").reset_index(drop=True)
-    else:
-        df = df_f
+    # snapshot do período (None = "Selecione"): lookup no índice, sem reagrupar a base
+    df = utils.lista_snapshot(DATA_FILE, new_fy, new_fq)
 
     numeric_cols = df.select_dtypes(include=["float64", "int64"]).columns.tolist()
     exclude_sliders = {"Preco_Atual","Valor_Empresa","Capital_Giro","Net_Debt","Lucro_Por_Acao", "CAGR5_Receita","DY_Medio_5anos","EBIT_per_share","EV_Receita","Giro_Ativos","Liquidez_Corrente_Calc",
@@ -163,75 +140,94 @@ def render_lista():
 
     term = st.session_state.get("filtro_busca", "").strip()
 
-    df_base = df.copy()
-
+    # busca e setor viram uma máscara sobre as linhas do snapshot (aplicada junto com os sliders)
+    keep = np.ones(len(df), dtype=bool)
     if term:
-        pattern = re.escape(term)
-        df = df[df["Ticker"].astype(str).str.contains(pattern, case=False, na=False)]
+        hits = ticker_search.search(utils.lista_search_index(DATA_FILE, new_fy, new_fq), term)
+        keep[:] = False
+        keep[hits] = True
     if setor_sel != "Selecione":
-        df = df[df["Setor_Oficial_final"] == setor_sel]
-    df = df_base.copy()
+        keep &= (df["Setor_Oficial_final"] == setor_sel).to_numpy()
+
+    # limites e índices ordenados pré-computados por período (uma máscara só no fim)
+    ranges_idx = utils.lista_range_index(DATA_FILE, new_fy, new_fq)
+    ranges = {}
 
     with st.expander("Filtros Avançados (Indicadores Numéricos)", expanded=False):
         for i in range(0, len(filtered_cols), 3):
             cols = st.columns(3)
             for j, col in enumerate(filtered_cols[i:i+3]):
-                serie = df_base[col].dropna()   # <-- importante: sempre sobre df_base
-                if serie.empty:
+                ix = ranges_idx["cols"].get(col)   # <-- importante: limites sempre sobre o snapshot inteiro
+                if ix is None:
                     continue
 
-                min_val, max_val = float(serie.min()), float(serie.max())
-                if min_val < 0:
-                    min_val = 0.0
-
-                if df_base[col].name == "ROE" or df_base[col].name == "ROA" or df_base[col].name == "ROIC":
-                    max_val = 1.0
-
-                if max_val > 100:
-                    max_val = 100.0
-
-                step = (max_val - min_val) / 100 if max_val != min_val else 1.0
+                min_val, max_val, step = ix["bounds"]
 
                 if min_val == max_val:
                     cols[j].markdown(f"*{col}: valor único ({min_val}) — filtro ignorado*")
                     continue
 
                 # slider mantém estado automaticamente via session_state
-                selected_range = cols[j].slider(
+                ranges[col] = cols[j].slider(
                     f"{col}", min_value=min_val, max_value=max_val,
                     value=(min_val, max_val), step=step, key=f"slider_{col}"
                 )
 
-                # aplica o filtro refinado
-                # df = df[(df[col] >= selected_range[0]) & (df[col] <= selected_range[1])]
-                if selected_range[0]==0:
-                    df = df[(df[col] >= selected_range[0]) | (df[col].isna()) | (df[col] < selected_range[0])]
-                    # pass
-                else:
-                    df = df[(df[col] >= selected_range[0]) | (df[col].isna())]
-                    
-                #condicional para quando o filtro for 100 ele tambem puxar valores maiores que 100
-                if selected_range[1]==100.0:
-                    pass
-                else:
-                    df = df[(df[col] <= selected_range[1])]
+    # aplica busca, setor e todas as faixas de uma vez (0 no mínimo e 100 no máximo = sem filtro naquele lado)
+    if ranges:
+        keep &= screener.range_mask(ranges_idx, ranges)
+    df_snap = df
+    if not keep.all():
+        df = df[keep]
 
     st.caption(f"{len(df)} ativos encontrados (1 linha por Ticker).")
 
+
+
+    #  Tabela interativa com seleção via AgGrid
+    #  só as colunas escolhidas e a página visível vão para o navegador;
+    #  ordenação e filtros rodam aqui, sobre o índice do snapshot
+    todas_cols = df_snap.columns.tolist()
+    if "grid_cols_sel" not in st.session_state:
+        salvas = [c for c in str(st.session_state.get("grid_cols", "")).split(",") if c in todas_cols]
+        st.session_state["grid_cols_sel"] = salvas or [c for c in GRID_DEFAULT_COLS if c in todas_cols]
+    if "grid_sort_col" not in st.session_state:
+        sort_qs = str(st.session_state.get("grid_sort", "Ticker"))
+        st.session_state["grid_sort_desc"] = sort_qs.startswith("-")
+        st.session_state["grid_sort_col"] = sort_qs.lstrip("-") if sort_qs.lstrip("-") in todas_cols else "Ticker"
+
+    colG1, colG2, colG3 = st.columns([4, 2, 1])
+    cols_sel = colG1.multiselect("Colunas da tabela", options=todas_cols, key="grid_cols_sel")
+    sort_col = colG2.selectbox("Ordenar por", options=todas_cols, key="grid_sort_col")
+    sort_desc = colG3.checkbox("Decrescente", key="grid_sort_desc")
+    # escolhas persistem na querystring (FILTER_STATE_MAP / goto)
+    st.session_state["grid_cols"] = ",".join(cols_sel)
+    st.session_state["grid_sort"] = f"{'-' if sort_desc else ''}{sort_col}"
+
     # ... depois da detecção de mudança de ano/trimestre e eventual reset da carteira:
     utils._push_filters_to_query()
 
+    grid_cols = ["Ticker"] + [c for c in cols_sel if c != "Ticker"]
+    order = screener.sort_order(ranges_idx, df_snap, sort_col, desc=sort_desc)
+    pos = order[keep[order]]
+
+    n_grid_pages = max(1, -(-len(pos) // GRID_PAGE_SIZE))
+    if st.session_state.get("grid_page", 1) > n_grid_pages:
+        st.session_state["grid_page"] = 1
+    grid_page = st.number_input(f"Página da tabela (de {n_grid_pages})", min_value=1, max_value=n_grid_pages,
+                                step=1, key="grid_page")
+    ini = (int(grid_page) - 1) * GRID_PAGE_SIZE
+    grid_df = df_snap.iloc[pos[ini:ini + GRID_PAGE_SIZE]][grid_cols].reset_index(drop=True)
 
-    #  Tabela interativa com seleção via AgGrid
     df_view = df.reset_index(drop=True)
     st.markdown("### 🔘 Clique em uma linha da tabela para filtrar abaixo")
 
-    gb = GridOptionsBuilder.from_dataframe(df_view)
+    gb = GridOptionsBuilder.from_dataframe(grid_df)
     gb.configure_selection('single', use_checkbox=True)
     grid_options = gb.build()
     
     grid_response = AgGrid(
-        df_view,
+        grid_df,
         gridOptions=grid_options,
         height=350,
         width='100%',
@@ -262,14 +258,47 @@ def render_lista():
     st.divider()
     st.write("**Ações disponíveis**")
 
-    for _, row in df_filtrado.iterrows():
-        ticker = str(row.get("Ticker", "")).strip()
-        preco_atual = float(row.get("Preco_Atual", 0))
-        if not ticker or preco_atual <= 0:
-            continue
-        c1, c2, c3 = st.columns([2, 1, 1])
-        c1.write(f"**{ticker}** — {row.get('Setor_Oficial_final','')}")
-        if c2.button("➕ Adicionar", key=f"add_{ticker}"):
-            adicionar_acao_dialog(ticker, preco_atual)
-        if c3.button("🔎 Analisar", key=f"det_{ticker}"):
-            utils.goto("detalhe", ticker=ticker)
+    # lista montada de forma vetorizada (sem ticker ou com preço <= 0 ficam de fora)
+    tickers_disp = df_filtrado["Ticker"].astype(str).str.strip()
+    if "Preco_Atual" in df_filtrado.columns:
+        precos = pd.to_numeric(df_filtrado["Preco_Atual"], errors="coerce")
+    else:
+        precos = pd.Series(0.0, index=df_filtrado.index)
+    ok = (tickers_disp != "") & ~(precos <= 0)
+    disp = pd.DataFrame({
+        "Ticker": tickers_disp[ok],
+        "Setor": df_filtrado["Setor_Oficial_final"][ok] if "Setor_Oficial_final" in df_filtrado.columns else "",
+        "Preço atual (R$)": precos[ok],
+    }).reset_index(drop=True)
+
+    if disp.empty:
+        st.info("Nenhuma ação disponível com os filtros atuais.")
+        return
+
+    # paginação: só a fatia visível vira widget/payload
+    colP1, colP2 = st.columns([1, 3])
+    page_size = colP1.selectbox("Ações por página", options=[10, 25, 50, 100], index=1, key="lista_page_size")
+    n_pages = max(1, -(-len(disp) // page_size))
+    if st.session_state.get("lista_page", 1) > n_pages:
+        st.session_state["lista_page"] = 1
+    page = colP2.number_input(f"Página (de {n_pages})", min_value=1, max_value=n_pages, step=1, key="lista_page")
+    ini = (int(page) - 1) * page_size
+    visiveis = disp.iloc[ini:ini + page_size]
+
+    st.dataframe(
+        visiveis, use_container_width=True, hide_index=True,
+        column_config={"Preço atual (R$)": st.column_config.NumberColumn(format="%.2f")},
+    )
+
+    # ações a partir de um único seletor (em vez de dois botões por linha)
+    opcoes = visiveis["Ticker"].tolist()
+    c1, c2, c3 = st.columns([2, 1, 1])
+    ticker = c1.selectbox(
+        "Ação", options=opcoes, index=0 if len(opcoes) == 1 else None,
+        placeholder="Escolha o papel", key="lista_acao_sel", label_visibility="collapsed",
+    )
+    if c2.button("➕ Adicionar", key="add_sel", disabled=ticker is None):
+        preco_atual = float(visiveis["Preço atual (R$)"].iloc[opcoes.index(ticker)])
+        adicionar_acao_dialog(ticker, preco_atual)
+    if c3.button("🔎 Analisar", key="det_sel", disabled=ticker is None):
+        utils.goto("detalhe", ticker=ticker)
@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import controller.utils as utils
+import controller.cashflow as cashflow
+import controller.montecarlo as montecarlo
 import altair as alt
 
 
@@ -10,6 +12,59 @@ import altair as alt
 # Pagina 2
 # =======================
 
+@st.fragment
+def _render_what_if(estado: dict, kpis: dict):
+    """
+    "E se...?": troca a quantidade de um ticker e mostra o efeito na hora.
+    Roda como fragmento (só este bloco reexecuta) sobre uma cópia do estado incremental.
+    """
+    with st.expander("E se...? (simular outra quantidade)"):
+        carteira = estado["carteira"]
+        if not carteira:
+            st.caption("Carteira vazia.")
+            return
+        c1, c2 = st.columns([1, 3])
+        tck = c1.selectbox("Ticker", options=list(carteira), key="whatif_ticker")
+        atual = int(carteira[tck])
+        qtd = c2.slider("Quantidade", min_value=0, max_value=max(10, atual * 3), value=atual,
+                        key=f"whatif_qtd_{tck}")
+
+        tl_w, k_w, _ = utils.state_timeline(utils.state_what_if(estado, tck, qtd))
+        if tl_w.empty:
+            st.caption("Sem trimestres para simular com essa quantidade.")
+            return
+
+        def _delta(a, b, pct=False):
+            if not (np.isfinite(a) and np.isfinite(b)) or np.isclose(a, b):
+                return None
+            return f"{(a - b) * 100:+.2f} p.p." if pct else f"{a - b:+,.2f}"
+
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Valor inicial (R$)", f"R$ {k_w['valor_inicial']:,.2f}", _delta(k_w["valor_inicial"], kpis["valor_inicial"]))
+        m2.metric("Final c/ div. (R$)", f"R$ {k_w['valor_final'] + k_w['div_acum']:,.2f}",
+                  _delta(k_w["valor_final"] + k_w["div_acum"], kpis["valor_final"] + kpis["div_acum"]))
+        m3.metric("Retorno total", f"{k_w['ret_total'] * 100:.2f}%" if np.isfinite(k_w["ret_total"]) else "n/d",
+                  _delta(k_w["ret_total"], kpis["ret_total"], pct=True))
+        m4.metric("CAGR", f"{k_w['cagr'] * 100:.2f}%" if np.isfinite(k_w["cagr"]) else "n/d",
+                  _delta(k_w["cagr"], kpis["cagr"], pct=True))
+
+        tl_a, _, _ = utils.state_timeline(estado)
+        comp = pd.DataFrame({
+            "Atual": (tl_a["Valor_Sem_Dividendos"] + tl_a["Dividendos_Trimestre"].cumsum()).to_numpy(),
+            f"{tck} = {qtd}": (tl_w["Valor_Sem_Dividendos"] + tl_w["Dividendos_Trimestre"].cumsum()).to_numpy(),
+        }, index=pd.Index([f"{a}T{t}" for a, t in zip(tl_w["Ano"], tl_w["Trimestre"])], name="Periodo"))
+        st.line_chart(comp.round(2), height=260)
+
+        if qtd != atual and st.button("Aplicar à carteira", key="whatif_aplicar"):
+            pf = st.session_state["portfolio"]
+            chave = next(k for k in pf if str(k).strip().upper() == tck)
+            if qtd > 0:
+                pf[chave]["quantidade"] = int(qtd)
+            else:
+                del pf[chave]
+            st.session_state.pop(f"edit_qtd_{chave}", None)  # campo da barra lateral volta a refletir a carteira
+            st.rerun()
+
 def render_simulacao():
     if st.button("← Voltar para a lista", key="sim_btn_voltar_lista"):
         st.session_state["portfolio"] = {}
@@ -44,10 +99,16 @@ def render_simulacao():
         st.warning("Período base inválido. Ajuste os filtros na Página 1.")
         return
 
-    # painel trimestral a partir da base COMPLETA
-    df_qy = utils.build_qy_panel("src/base_para_simulador_indicadores_refatorado.csv")
+    # matrizes do painel trimestral (base COMPLETA), mapeadas em memória e compartilhadas entre workers
+    df_qy = utils.load_qy_matrices("src/base_para_simulador_indicadores_refatorado.csv")
+
+    # estado incremental da carteira: edição/inclusão/retirada de um ticker só soma Δq × vetor unitário
+    estado = utils.sync_portfolio_state(st.session_state.get("_sim_estado"), portfolio, df_qy, ano_base, tri_base)
+    st.session_state["_sim_estado"] = estado
 
-    timeline, kpis, excluidos, details = utils.simulate_historical_quarterly(portfolio, df_qy, ano_base, tri_base)
+    # resultado em cache (mesma carteira + base + dados => sem recomputar no rerun)
+    res = utils.run_simulation_cached(portfolio, df_qy, ano_base, tri_base, estado=estado)
+    timeline, kpis, excluidos = res["timeline"], res["kpis"], res["excluidos"]
     
 
 
@@ -61,7 +122,7 @@ def render_simulacao():
     
 
     # ==== VISUALIZAÇÕES ====
-    tl = utils._prep_timeline_quarterly(timeline)
+    tl = res["tl"]
 
     csv = tl[["Ano", "Trimestre", "Periodo", "Valor_Sem_Dividendos", "Dividendos_Trimestre", "Div_Acumulado", "Valor_Total", "Drawdown"]].to_csv(index=False, encoding="utf-8-sig")
     st.download_button(
@@ -75,7 +136,7 @@ def render_simulacao():
 
     # KPIs
     # ===== Retornos e risco (insights rápidos) =====
-    tl_metrics, vol_anual, hit_ratio, max_dd = utils._prep_metrics_quarterly(timeline, kpis["valor_inicial"])
+    tl_metrics, vol_anual, hit_ratio, max_dd = res["tl_metrics"], res["vol_anual"], res["hit_ratio"], res["max_dd"]
 
     # salva/atualiza histórico desta execução (com dedupe por run_key)
     utils.save_simulation_run(
@@ -112,6 +173,8 @@ def render_simulacao():
     )
 
 
+    _render_what_if(estado, kpis)
+
     st.subheader("Evolução da carteira (trimestral)")
     col_line, col_bar = st.columns(2)
  
@@ -141,6 +204,10 @@ def render_simulacao():
 
     st.markdown("Desempenho por ticker")
 
+    # tabelas por ticker montadas sob demanda (a timeline e os KPIs não precisam delas)
+    por_ticker = utils.ticker_tables(res)
+    details = por_ticker["details"]
+
     if details is None or details.empty:
         st.info("Sem detalhe por ticker disponível para este período.")
     else:
@@ -199,17 +266,12 @@ def render_simulacao():
         chart_val = (line + points + labels + rule).properties(height=300).interactive()
         st.altair_chart(chart_val, use_container_width=True)
 
-        # (Opcional) Retorno trimestral por ticker vs. trimestre anterior
-        det = det.sort_values(["Ticker", "Ano", "Trimestre"]).copy()
-        det["Ret_Ticker_Trimestre"] = np.nan
-        for tck in det["Ticker"].unique():
-            g = det[det["Ticker"] == tck].copy()
-            v = g["Valor_Ticker"].astype(float)
-            ret = ((v + g["Dividendos_Ticker"].astype(float)) / v.shift(1)) - 1.0
-            det.loc[g.index, "Ret_Ticker_Trimestre"] = ret.values
-
+        # (Opcional) Retorno trimestral por ticker vs. trimestre anterior — matriz larga do motor
         st.markdown("**Retorno por ticker (trimestre)**")
-        det_ret = det.dropna(subset=["Ret_Ticker_Trimestre"]).copy()
+        ret_w = por_ticker["returns"][[t for t in sel if t in por_ticker["returns"].columns]]
+        det_ret = (ret_w.reset_index()
+                        .melt(id_vars="Periodo", var_name="Ticker", value_name="Ret_Ticker_Trimestre")
+                        .dropna(subset=["Ret_Ticker_Trimestre"]))
         chart_ret = alt.Chart(det_ret).mark_bar().encode(
             x="Periodo:T",
             y=alt.Y("Ret_Ticker_Trimestre:Q", axis=alt.Axis(format="%"), title="Retorno"),
@@ -223,62 +285,29 @@ def render_simulacao():
     # ===== Ranking de contribuição por ticker =====
     st.subheader("composição do resuTickers que mais renderam no período")
 
-    # Mapas auxiliares (quantidade e preço-base)
-    qty_map = {str(k).strip().upper(): int(v.get("quantidade", 0)) for k, v in portfolio.items()}
-    base_df = df_qy[(df_qy["FY"] == ano_base) & (df_qy["FQ"] == tri_base)][["Ticker", "Preco_QY"]].dropna()
-    base_prices = dict(zip(base_df["Ticker"].astype(str).str.upper(), base_df["Preco_QY"]))
-
-    rank_rows, excl_tickers = [], []
-
-    # período final (última linha do timeline)
-    end_ano = int(tl_metrics["Ano"].iloc[-1])
-    end_tri = int(tl_metrics["Trimestre"].iloc[-1])
+    # atribuição por ticker calculada pelo motor (mesma tabela alimenta o waterfall)
+    attr = por_ticker["attribution"]
+    carteira = {str(k).strip().upper() for k in portfolio}
+    excl_tickers = []
 
     if details is None or details.empty:
         st.info("Sem detalhe por ticker disponível; não é possível montar o ranking.")
     else:
-        det_all = details.copy()
-        det_all["Ticker"] = det_all["Ticker"].astype(str).str.upper()
-
-        for tck, qtd in qty_map.items():
-            preco_base = base_prices.get(tck, np.nan)
-            if not np.isfinite(preco_base) or qtd <= 0:
-                excl_tickers.append(tck)
-                continue
-
-            valor_inicial = float(qtd * preco_base)
-
-            # pega o último valor disponível até o fim do período; se faltar no fim, usa o último válido
-            det_t = det_all[(det_all["Ticker"] == tck) &
-                            ((det_all["Ano"] < end_ano) | ((det_all["Ano"] == end_ano) & (det_all["Trimestre"] <= end_tri)))]
-            if det_t.empty:
-                excl_tickers.append(tck)
-                continue
-
-            det_t = det_t.sort_values(["Ano", "Trimestre"])
-            valor_final = float(det_t["Valor_Ticker"].dropna().iloc[-1]) if det_t["Valor_Ticker"].notna().any() else np.nan
-            div_periodo = float(det_t["Dividendos_Ticker"].fillna(0).sum())
-
-            if not np.isfinite(valor_final):
-                excl_tickers.append(tck)
-                continue
-
-            ganho_total = valor_final + div_periodo - valor_inicial
-            ret_pct = ganho_total / valor_inicial if valor_inicial > 0 else np.nan
-
-            rank_rows.append({
-                "Ticker": tck,
-                "Qtd": int(qtd),
-                "Preço base (QY)": float(preco_base),
-                "Valor inicial (R$)": valor_inicial,
-                "Valor final (R$)": valor_final,
-                "Dividendos (R$)": div_periodo,
-                "Ganho total (R$)": ganho_total,
-                "Retorno (%)": ret_pct * 100 if np.isfinite(ret_pct) else np.nan,
-            })
-
-        if rank_rows:
-            rank_df = pd.DataFrame(rank_rows).sort_values("Ganho total (R$)", ascending=False).reset_index(drop=True)
+        # só entra quem tem valor final no período (último preço válido)
+        rank_attr = attr[np.isfinite(attr["Valor_Final"])]
+        excl_tickers = list(carteira - set(rank_attr["Ticker"]))
+
+        if not rank_attr.empty:
+            rank_df = pd.DataFrame({
+                "Ticker": rank_attr["Ticker"],
+                "Qtd": rank_attr["Qtd"],
+                "Preço base (QY)": rank_attr["Preco_Base"],
+                "Valor inicial (R$)": rank_attr["Valor_Inicial"],
+                "Valor final (R$)": rank_attr["Valor_Final"],
+                "Dividendos (R$)": rank_attr["Dividendos"],
+                "Ganho total (R$)": rank_attr["Ganho_Total"],
+                "Retorno (%)": rank_attr["Retorno"] * 100,
+            }).sort_values("Ganho total (R$)", ascending=False).reset_index(drop=True)
 
             # formatação leve
             fmt_cols = ["Valor inicial (R$)", "Valor final (R$)", "Dividendos (R$)", "Ganho total (R$)"]
@@ -352,44 +381,11 @@ def render_simulacao():
         if details is None or details.empty:
             st.info("Sem detalhe por ticker para montar a decomposição.")
         else:
-            # Mapas de quantidade e preço-base (mesmo conceito do ranking)
-            qty_map = {str(k).strip().upper(): int(v.get("quantidade", 0)) for k, v in portfolio.items()}
-            base_df = df_qy[(df_qy["FY"] == ano_base) & (df_qy["FQ"] == tri_base)][["Ticker", "Preco_QY"]].dropna()
-            base_prices = dict(zip(base_df["Ticker"].astype(str).str.upper(), base_df["Preco_QY"]))
-
-            # período final (último trimestre simulado)
-            end_ano = int(tl["Ano"].iloc[-1])
-            end_tri = int(tl["Trimestre"].iloc[-1])
-
-            det_all = details.copy()
-            det_all["Ticker"] = det_all["Ticker"].astype(str).str.upper()
-
-            # totais de início/fim e contribuições
-            total_inicio = 0.0
-            total_div    = 0.0
-            contribs = []  # lista de {"label": tck, "value": delta_preco}
-
-            for tck, qtd in qty_map.items():
-                preco_base = base_prices.get(tck, np.nan)
-                if not np.isfinite(preco_base) or qtd <= 0:
-                    continue
-
-                valor_inicial = float(qtd * preco_base)
-                total_inicio += valor_inicial
-
-                det_t = det_all[(det_all["Ticker"] == tck) &
-                                ((det_all["Ano"] < end_ano) | ((det_all["Ano"] == end_ano) & (det_all["Trimestre"] <= end_tri)))]
-                if det_t.empty:
-                    continue
-
-                det_t = det_t.sort_values(["Ano", "Trimestre"])
-                valor_final = float(det_t["Valor_Ticker"].dropna().iloc[-1]) if det_t["Valor_Ticker"].notna().any() else np.nan
-                div_periodo = float(det_t["Dividendos_Ticker"].fillna(0).sum())
-                total_div += div_periodo
-
-                if np.isfinite(valor_final):
-                    delta_preco = valor_final - valor_inicial
-                    contribs.append({"label": tck, "value": float(delta_preco)})
+            # totais de início e dividendos + Δ preço por ticker, da atribuição do motor
+            total_inicio = float(attr["Valor_Inicial"].sum())
+            total_div = float(attr["Dividendos"].sum())
+            com_final = attr[np.isfinite(attr["Valor_Final"])]
+            contribs = [{"label": t, "value": float(v)} for t, v in zip(com_final["Ticker"], com_final["Delta_Preco"])]
 
             total_fim_com_div = float((kpis.get("valor_final", 0.0) or 0.0) + (kpis.get("div_acum", 0.0) or 0.0))
 
@@ -456,22 +452,8 @@ def render_simulacao():
         if details is None or details.empty:
             st.info("Sem detalhe por ticker para estimar risco/retorno.")
         else:
-            det = details.copy().sort_values(["Ticker", "Ano", "Trimestre"])
-            # retorno trimestral do ticker: (preço*qtd + dividendos) / (preço*qtd anterior) - 1
-            det["ret_ticker"] = det.groupby("Ticker").apply(
-                lambda g: ((g["Valor_Ticker"].astype(float) + g["Dividendos_Ticker"].fillna(0.0).astype(float))
-                        / g["Valor_Ticker"].astype(float).shift(1) - 1.0)
-            ).reset_index(level=0, drop=True)
-
-            agg = det.groupby("Ticker").agg(
-                ret_total_ticker=("ret_ticker", lambda s: (np.prod(1 + s.dropna()) - 1) if s.dropna().size > 0 else np.nan),
-                vol_ticker=("ret_ticker", lambda s: (s.dropna().std(ddof=0) * np.sqrt(4)) if s.dropna().size > 1 else np.nan),
-                valor_final=("Valor_Ticker", "last")
-            ).reset_index()
-
-            # peso final na carteira (normaliza pelos que têm valor_final)
-            tot_final = agg["valor_final"].sum()
-            agg["peso_final"] = agg["valor_final"] / tot_final if tot_final > 0 else np.nan
+            # retorno composto, vol anualizada e peso final por ticker (colunas da matriz de retornos)
+            agg = por_ticker["ticker_risk"]
 
             data_sc = agg.dropna(subset=["ret_total_ticker", "vol_ticker"]).copy()
             if data_sc.empty:
@@ -502,7 +484,142 @@ def render_simulacao():
     except Exception as _e:
         st.info("Não foi possível montar o scatter de risco × retorno.")
 
-    
+
+    # === Momento de entrada: todas as datas-base × datas-fim ===
+    st.markdown("**Momento de entrada (todas as datas-base × datas-fim)**")
+
+    try:
+        sweep = utils.cached_derived(res, "entry_sweep", lambda: utils.simulate_entry_sweep(portfolio, df_qy))
+        hm = utils.cached_derived(res, "entry_sweep_long", lambda: utils.entry_sweep_long(sweep))
+        if hm.empty:
+            st.info("Sem pares base × fim suficientes para o mapa de calor.")
+        else:
+            metricas = {
+                "ret_total": "Retorno total (c/ div.)",
+                "cagr": "CAGR",
+                "max_dd": "Máx. drawdown",
+                "div_acum": "Dividendos (R$)",
+            }
+            met = st.selectbox("Métrica", options=list(metricas), format_func=metricas.get, key="sel_sweep_metrica")
+            fmt_met = ",.2f" if met == "div_acum" else ".2%"
+            ordem = [f"{a}T{t}" for a, t in zip(sweep["anos"], sweep["trimestres"])]
+
+            chart_hm = (
+                alt.Chart(hm)
+                .mark_rect()
+                .encode(
+                    x=alt.X("Fim:O", sort=ordem, title="Fim"),
+                    y=alt.Y("Base:O", sort=ordem, title="Base (compra)"),
+                    color=alt.Color(f"{met}:Q", title=metricas[met], scale=alt.Scale(scheme="redyellowgreen")),
+                    tooltip=[
+                        alt.Tooltip("Base:O"),
+                        alt.Tooltip("Fim:O"),
+                        alt.Tooltip(f"{met}:Q", title=metricas[met], format=fmt_met),
+                    ],
+                )
+                .properties(height=420)
+            )
+            st.altair_chart(chart_hm, use_container_width=True)
+            st.caption(f"Mesmas quantidades da carteira compradas em cada trimestre-base. Base atual: {ano_base}T{tri_base}.")
+    except Exception as _e:
+        st.info("Não foi possível montar o mapa de calor de entrada.")
+
+    # === Aportes periódicos: mesma carteira (pesos em valor no trimestre-base) com fluxos de caixa ===
+    st.subheader("Aportes periódicos")
+
+    try:
+        pesos = dict(zip(attr["Ticker"], attr["Valor_Inicial"]))
+        f1, f2, f3, f4, f5 = st.columns(5)
+        inicial = f1.number_input("Valor inicial (R$)", min_value=0.0, value=round(valor_inicial, 2), step=100.0, key="cf_inicial")
+        aporte = f2.number_input("Aporte (R$)", min_value=0.0, value=0.0, step=100.0, key="cf_aporte")
+        freqs = {1: "Trimestral", 2: "Semestral", 4: "Anual"}
+        every = f3.selectbox("Frequência", options=list(freqs), format_func=freqs.get, key="cf_freq")
+        rebal = f4.number_input("Rebalancear a cada (trim.)", min_value=0, value=0, step=1, key="cf_rebal",
+                                help="0 = nunca rebalancear")
+        drip = f5.checkbox("Reinvestir dividendos", value=True, key="cf_drip")
+
+        n_t = len(timeline) + 1
+        sim_cf = cashflow.simulate_cashflows(
+            df_qy, pesos, ano_base, tri_base,
+            cashflow.contribution_schedule(n_t, inicial, aporte, every),
+            drip=drip, rebalance_every=int(rebal),
+        )
+        tl_cf = cashflow.cashflow_timeline(sim_cf)
+
+        g1, g2, g3, g4 = st.columns(4)
+        twr_a, irr_a = float(sim_cf["twr_anual"][0]), float(sim_cf["irr_anual"][0])
+        g1.metric("Total aportado (R$)", f"R$ {sim_cf['total_aportado'][0]:,.2f}")
+        g2.metric("Valor final (R$)", f"R$ {sim_cf['valor_final'][0]:,.2f}")
+        g3.metric("TWR anualizado", f"{twr_a * 100:.2f}%" if np.isfinite(twr_a) else "n/d")
+        g4.metric("TIR anualizada", f"{irr_a * 100:.2f}%" if np.isfinite(irr_a) else "n/d")
+
+        tl_cf.index = pd.Index([f"{a}T{t}" for a, t in zip(tl_cf["Ano"], tl_cf["Trimestre"])], name="Periodo")
+        st.line_chart(tl_cf[["Aportado_Acum", "Valor"]].round(2), height=280)
+        st.caption("TWR: retorno da cota, sem efeito do tamanho/momento dos aportes. "
+                   "TIR: retorno ponderado pelo capital (considera quando cada aporte entrou). "
+                   "Compras fracionadas pelo preço médio do trimestre; sem reinvestimento, dividendos ficam em caixa.")
+    except Exception as _e:
+        st.info("Não foi possível simular os aportes periódicos.")
+
+    # === Cenários: bootstrap em blocos dos retornos trimestrais (trimestres inteiros) ===
+    st.subheader("Cenários (bootstrap do histórico)")
+
+    if st.toggle("Simular cenários a partir do histórico", value=False, key="mc_ativo"):
+        try:
+            m1, m2, m3, m4, m5 = st.columns(5)
+            n_paths = m1.selectbox("Cenários", options=[1_000, 10_000, 100_000], index=1,
+                                   format_func=lambda n: f"{n:,}".replace(",", "."), key="mc_n")
+            horizonte = m2.number_input("Horizonte (trim.)", min_value=4, max_value=120, value=40, step=4, key="mc_h")
+            bloco = m3.number_input("Bloco (trim.)", min_value=1, max_value=12, value=4, step=1, key="mc_bloco")
+            semente = m4.number_input("Semente", min_value=0, value=0, step=1, key="mc_seed")
+            rebal_mc = m5.checkbox("Rebalancear todo trimestre", value=False, key="mc_rebal")
+
+            # leque guardado junto do resultado (só percentis; os cenários não ficam em memória)
+            chave_mc = f"mc_fan|{n_paths}|{horizonte}|{bloco}|{semente}|{rebal_mc}"
+
+            def _leque():
+                qr = montecarlo.quarter_returns(df_qy, dict(zip(attr["Ticker"], attr["Valor_Inicial"])))
+                cresc = montecarlo.bootstrap_paths(qr, int(n_paths), int(horizonte), int(bloco),
+                                                   seed=int(semente), rebalance=rebal_mc)
+                return montecarlo.fan(cresc, valor_inicial), len(qr["retornos"])
+
+            with st.spinner("Gerando cenários..."):
+                leque, n_hist = utils.cached_derived(res, chave_mc, _leque)
+
+            fim = montecarlo.final_summary(leque)
+            st.dataframe(pd.DataFrame({
+                "Percentil": fim["Percentil"].map(lambda p: f"P{p}"),
+                "Valor final (R$)": fim["Valor_Final"].round(2),
+                "CAGR (%)": (fim["CAGR"] * 100).round(2),
+                "Máx. drawdown (%)": (fim["Max_DD"] * 100).round(2),
+            }), hide_index=True, use_container_width=True)
+
+            titulos = {"Valor": ("Valor da carteira (R$)", ",.2f"), "CAGR": ("CAGR", ".2%"), "Max_DD": ("Máx. drawdown", ".2%")}
+            cols_mc = st.columns(3)
+            for (met, (titulo, fmt_mc)), col in zip(titulos.items(), cols_mc):
+                larga = (leque[leque["Metrica"] == met]
+                         .pivot(index="Trimestre", columns="Percentil", values="Valor")
+                         .rename(columns=lambda p: f"P{p}").reset_index())
+                base_mc = alt.Chart(larga).encode(x=alt.X("Trimestre:Q", title="Trimestres à frente"))
+                chart_mc = (
+                    base_mc.mark_area(opacity=0.2).encode(y=alt.Y("P5:Q", title=titulo, axis=alt.Axis(format=fmt_mc)), y2="P95:Q")
+                    + base_mc.mark_area(opacity=0.4).encode(y="P25:Q", y2="P75:Q")
+                    + base_mc.mark_line().encode(
+                        y="P50:Q",
+                        tooltip=[alt.Tooltip("Trimestre:Q")] + [alt.Tooltip(f"P{p}:Q", format=fmt_mc) for p in montecarlo.PERCENTIS],
+                    )
+                ).properties(height=280)
+                with col:
+                    st.markdown(f"**{titulo}**")
+                    st.altair_chart(chart_mc, use_container_width=True)
+
+            st.caption(f"{int(n_paths):,} cenários sorteando blocos de {int(bloco)} trimestres inteiros de {n_hist} trimestres "
+                       "do histórico (mantém a correlação entre os tickers). Faixas: P5–P95 e P25–P75; linha: mediana. "
+                       "Retornos incluem dividendos reinvestidos.")
+        except Exception as _e:
+            st.info("Não foi possível gerar os cenários.")
+
+
 
 
     st.markdown("Tabela de resultados (detalhada)")